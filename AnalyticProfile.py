@@ -0,0 +1,183 @@
+##
+#   AnalyticProfile.py
+#
+#   Thrust profiles from the continuous form of ThrustProfile's model, for one tank or a whole batch at once.
+#   Requires numpy.
+##
+
+import numpy
+
+import Tank
+import ThrustProfile
+
+
+class ProfileCurves:
+    """ Thrust curves of a batch of tanks sampled on a shared time grid. The 2D arrays have one row per tank and one
+    column per sample; row i is only meaningful for its first count[i] samples. """
+
+    def __init__(self, time, thrust, massflow, mass, water, pressure, volume, count, burnoutTime, burnTime, impulse):
+        self.time = time  # s, shared sample times
+        self.thrust = thrust  # N
+        self.massflow = massflow  # kg/s
+        self.mass = mass  # kg, water and air left in the tank
+        self.water = water  # kg
+        self.pressure = pressure  # Pa, tank pressure
+        self.volume = volume  # m^3, air volume
+        self.count = count  # Samples in each row
+        self.burnoutTime = burnoutTime  # s, when the water runs out, or the burn stalls at ambient pressure
+        self.burnTime = burnTime  # s, when the tank reaches ambient pressure
+        self.impulse = impulse  # N s, integral of the exact thrust over the burn and blowdown
+
+    def __len__(self):
+        return len(self.count)
+
+
+class AnalyticProfile(ThrustProfile.ThrustProfile):
+    """ Solves ThrustProfile's burn and blowdown in closed form instead of stepping them, so the curves can be sampled
+    at any resolution and a batch of tanks costs a handful of array operations.
+
+    Burn: the air expands adiabatically, p = p0 (V0 / V)^1.4, while the water leaves at dV/dt = Cd A sqrt(2 (p - pa) /
+    rho). With w = sqrt((p - pa) / p0) the time to reach w is a smooth integral over w, found by quadrature and
+    inverted by interpolation. Thrust is m_dot u_e = 2 Cd A (p - pa).
+    Blowdown: the remaining air leaves isothermally from the tank volume, which gives p = pa cosh^2(theta) with theta
+    falling linearly in time. Thrust is m_dot u_e + A (p - pa) = 3 A (p - pa).
+
+    A tank whose air expands to ambient pressure before the water is gone stalls: like the loop, it stops there with
+    water left and no blowdown.
+
+    This is the limit of the stepping loop as dt goes to 0, with the blowdown starting from the isothermal pressure of
+    the remaining air (where the loop snaps to after its first blowdown step). The loop records each thrust one step
+    after the state it was evaluated from, so the two agree to O(dt); see compare. Like getThrustProfile, the air and
+    water volumes are swapped. """
+    gamma = Tank.Tank.gamma
+    dischargeCoefficient = Tank.Tank.dischargeCoefficient  # Orifice C_d used in the water burn
+    gasConstant = Tank.Tank.gasConstant * Tank.Tank.temperature  # R T, J/kg
+    nodes = 1025  # Quadrature nodes over the burn
+
+    def curves(self, p_air, vol_air, vol_water, noz):
+        """ Returns the profiles of a batch of tanks sampled every dt.
+        :param p_air: array Initial tank pressures (Pa). The other arguments are arrays of the same length (or
+        scalars), in the order and units of getThrustProfile.
+        :rtype : ProfileCurves
+        """
+        p0, volumeWater, volumeAir, noz = [numpy.atleast_1d(numpy.asarray(value, dtype=float))
+                                           for value in (p_air, vol_air, vol_water, noz)]
+        p0, volumeWater, volumeAir, noz = numpy.broadcast_arrays(p0, volumeWater, volumeAir, noz)
+        count = len(p0)
+        gamma = self.gamma
+        pa = self.p_atmosphere
+        rho = self.rho_water
+        RT = self.gasConstant
+        area = Tank.Tank.nozzleArea(noz)
+        total = volumeAir + volumeWater
+        ratio = pa / p0
+
+        # Burn: t(w) = 2 V0 / (gamma k) * integral from w to w0 of (w'^2 + pa/p0)^(-(1 + gamma) / gamma) dw'.
+        k = self.dischargeCoefficient * area * numpy.sqrt(2 * p0 / rho)
+        w0 = numpy.sqrt(numpy.maximum(1 - ratio, 0.0))
+        # Stalled rows reach ambient pressure (w = 0) before the air fills the tank.
+        stalled = (volumeAir / total) ** gamma <= ratio
+        wEnd = numpy.sqrt(numpy.maximum((volumeAir / total) ** gamma - ratio, 0.0))
+        fraction = numpy.linspace(0.0, 1.0, self.nodes)
+        w = w0[:, None] + (wEnd - w0)[:, None] * fraction  # Falling from w0 to wEnd
+        integrand = (w ** 2 + ratio[:, None]) ** (-(1 + gamma) / gamma)
+        steps = (integrand[:, 1:] + integrand[:, :-1]) * 0.5 * (w0 - wEnd)[:, None] / (self.nodes - 1)
+        burnTimes = numpy.zeros_like(w)
+        burnTimes[:, 1:] = numpy.cumsum(steps, axis=1) * (2 * volumeAir / (gamma * k))[:, None]
+        burnoutTime = burnTimes[:, -1]
+        # Burn impulse: integral of 2 Cd A p0 w^2 dt, on the same nodes.
+        force = 2 * self.dischargeCoefficient * area[:, None] * p0[:, None] * w ** 2
+        burnImpulse = ((force[:, 1:] + force[:, :-1]) * 0.5 * numpy.diff(burnTimes, axis=1)).sum(axis=1)
+
+        # Blowdown: p = pa cosh^2(theta), theta = thetaB - c (t - burnout), from p = m_air R T / V_total. Stalled rows
+        # have none (thetaB = 0).
+        pBlowdown = p0 * volumeAir / total
+        thetaB = numpy.where(stalled, 0.0, numpy.arccosh(numpy.sqrt(numpy.maximum(pBlowdown / pa, 1.0))))
+        c = area * numpy.sqrt(2 * RT) / (2 * total)
+        burnTime = burnoutTime + thetaB / c
+        # Blowdown impulse: integral of 3 A pa sinh^2(theta) dt.
+        blowdownImpulse = 3 * area * pa / c * (numpy.sinh(2 * thetaB) / 4 - thetaB / 2)
+
+        # Samples at 0, dt, 2 dt, ... up to the first one at or past the end. Unlike the stepping loop, which records
+        # its first sample after one step, the ignition thrust is included so the flight interpolates the first step.
+        samples = numpy.ceil(burnTime / self.dt - 1e-9).astype(int) + 1
+        time = self.dt * numpy.arange(samples.max())
+        t = numpy.broadcast_to(time, (count, len(time)))
+        # Stalled rows hold their final burn state, water included.
+        burning = (t <= burnoutTime[:, None]) | stalled[:, None]
+
+        wNow = self.__interpolateRows(numpy.minimum(t, burnoutTime[:, None]), burnTimes, w)
+        theta = numpy.maximum(thetaB[:, None] - c[:, None] * (t - burnoutTime[:, None]), 0.0)
+        pressure = numpy.where(burning, p0[:, None] * (wNow ** 2 + ratio[:, None]), pa * numpy.cosh(theta) ** 2)
+        gauge = numpy.maximum(pressure - pa, 0.0)
+        volume = numpy.where(burning, volumeAir[:, None] * (pressure / p0[:, None]) ** (-1 / gamma), total[:, None])
+        water = rho * numpy.maximum(total[:, None] - volume, 0.0)
+        airMass = numpy.where(burning, (volumeAir * p0 / RT)[:, None], pressure * total[:, None] / RT)
+        massflow = numpy.where(burning, rho * k[:, None] * wNow, area[:, None] * numpy.sqrt(2 * pressure * gauge / RT))
+        thrust = numpy.where(burning, 2 * self.dischargeCoefficient, 3.0) * area[:, None] * gauge
+        return ProfileCurves(time, thrust, massflow, water + airMass, water, pressure, volume, samples, burnoutTime,
+                             burnTime, burnImpulse + blowdownImpulse)
+
+    @staticmethod
+    def __interpolateRows(x, xp, fp):
+        """ Interpolates every row of x in the matching rows of xp (ascending) and fp, in a single search. """
+        rows = numpy.arange(len(xp))[:, None]
+        span = xp[:, -1].max() + 1.0
+        flat = (xp + rows * span).ravel()
+        index = numpy.searchsorted(flat, (x + rows * span).ravel(), side="right").reshape(x.shape) - 1
+        index = numpy.clip(index, rows * xp.shape[1], (rows + 1) * xp.shape[1] - 2)
+        left = flat[index] - rows * span
+        width = flat[index + 1] - flat[index]
+        weight = numpy.where(width > 0, (x - left) / numpy.where(width > 0, width, 1.0), 0.0)
+        values = fp.ravel()
+        return values[index] + weight * (values[index + 1] - values[index])
+
+    def getThrustProfile(self, p_air, vol_air, vol_water, noz, write=True):
+        """ Returns the same list of tuples as ThrustProfile.getThrustProfile, from the closed form solution. """
+        self.d_noz = noz
+        self.p_air_total = p_air
+        self.vol_water_total = vol_air
+        self.vol_air_total = vol_water
+        self.init()
+        curves = self.curves(p_air, vol_air, vol_water, noz)
+        count = curves.count[0]
+        self.time_list = curves.time[:count].tolist()
+        self.thrust = curves.thrust[0, :count].tolist()
+        self.m_dot_list = curves.massflow[0, :count].tolist()
+        water = curves.water[0, :count].tolist()
+        air = (curves.mass[0, :count] - curves.water[0, :count]).tolist()
+        volume = curves.volume[0, :count].tolist()
+        pressure = curves.pressure[0, :count].tolist()
+        total = self.vol_air_total + self.vol_water_total
+        # The fuel mass column holds the water during the burn and the air during the blowdown, as in ThrustProfile.
+        self.m_water_list = [water[i] if water[i] > 0 else air[i] for i in range(count)]
+        self.time = self.time_list[-1]
+        self.m_dot_water = self.m_dot_list[-1]
+        self.m_air_current, self.m_water_current, self.p_air_current = air[-1], water[-1], pressure[-1]
+        stuff = [(self.time_list[i], self.thrust[i], self.m_dot_list[i], water[i] + air[i], volume[i],
+                  total - volume[i], self.vol_air_total, self.vol_water_total, air[i], water[i], pressure[i])
+                 for i in range(count)]
+        if write:
+            self.output()
+        return stuff
+
+    def compare(self, p_air, vol_air, vol_water, noz):
+        """ Cross checks the closed form against the stepping loop at this dt.
+        :rtype : dict Burn time, burnout time and total impulse from both, and the largest thrust difference (N)
+        during the water burn between the loop's samples and the closed form at the start of each step, where the
+        loop evaluates its thrust.
+        """
+        stepper = ThrustProfile.ThrustProfile()
+        stepper.dt = self.dt
+        stepper.p_atmosphere = self.p_atmosphere
+        stepped = stepper.getThrustProfile(p_air, vol_air, vol_water, noz, False)
+        curves = self.curves(p_air, vol_air, vol_water, noz)
+        count = curves.count[0]
+        steppedBurnout = next((moment[0] for moment in stepped if moment[9] <= 0), stepped[-1][0])
+        steppedBurn = sum(1 for moment in stepped if moment[9] > 0)
+        shared = min(int(numpy.searchsorted(curves.time, curves.burnoutTime[0])), steppedBurn)
+        lagging = numpy.abs(numpy.array([moment[1] for moment in stepped[:shared]]) - curves.thrust[0, :shared])
+        return {"burnTime": (float(curves.time[count - 1]), stepped[-1][0]),
+                "burnoutTime": (float(curves.burnoutTime[0]), steppedBurnout),
+                "impulse": (float(curves.impulse[0]), sum(moment[1] for moment in stepped) * self.dt),
+                "thrustError": float(lagging.max()) if shared > 0 else 0.0}
@@ -0,0 +1,94 @@
+##
+#   Atmosphere.py
+#
+#   International Standard Atmosphere, tabulated over altitude for fast lookups during the flight.
+##
+
+import math
+from array import array
+
+
+class Atmosphere:
+    """ Density, pressure and speed of sound by height above the launch site. The 1976 standard atmosphere
+    (troposphere and the isothermal layer above it, to 20 km) is evaluated once per table row when the table is
+    built; lookups index straight into the table and interpolate between the two rows around the height.
+    Heights outside the table use the nearest row. """
+    # ISA constants
+    seaLevelTemperature = 288.15  # K
+    seaLevelPressure = 101325.0  # Pa
+    lapseRate = 0.0065  # K/m, up to the tropopause
+    tropopause = 11000.0  # m
+    gasConstant = 287.05  # J/(kg K)
+    gamma = 1.4
+    gravity = 9.80665  # m/s^2
+
+    def __init__(self, elevation=0.0, step=10.0, ceiling=5000.0, temperatureOffset=0.0):
+        """
+        :param elevation: float Height of the launch site above sea level (m).
+        :param step: float Height between table rows (m).
+        :param ceiling: float Height above the launch site covered by the table (m).
+        :param temperatureOffset: float Added to the standard temperature at every height (K), for hot or cold days.
+        """
+        self.elevation = elevation
+        self.step = float(step)
+        self.temperatureOffset = temperatureOffset
+        self.count = max(2, int(math.ceil(ceiling / self.step)) + 1)
+        self.ceiling = (self.count - 1) * self.step
+        self.density = array('d')  # kg/m^3
+        self.pressure = array('d')  # Pa
+        self.speedOfSound = array('d')  # m/s
+        for i in range(self.count):
+            temperature, pressure, density = self.standard(elevation + i * self.step, temperatureOffset)
+            self.density.append(density)
+            self.pressure.append(pressure)
+            self.speedOfSound.append(math.sqrt(self.gamma * self.gasConstant * temperature))
+
+    @classmethod
+    def standard(cls, altitude, temperatureOffset=0.0):
+        """ Evaluates the standard atmosphere directly. Slow; use the table for anything called every step.
+        :param altitude: float Geopotential altitude above sea level (m), up to 20 km.
+        :rtype : tuple (temperature (K), pressure (Pa), density (kg/m^3))
+        """
+        exponent = cls.gravity / (cls.lapseRate * cls.gasConstant)
+        if altitude <= cls.tropopause:
+            temperature = cls.seaLevelTemperature - cls.lapseRate * altitude
+            pressure = cls.seaLevelPressure * (temperature / cls.seaLevelTemperature) ** exponent
+        else:
+            temperature = cls.seaLevelTemperature - cls.lapseRate * cls.tropopause
+            pressure = cls.seaLevelPressure * (temperature / cls.seaLevelTemperature) ** exponent * math.exp(
+                -cls.gravity * (altitude - cls.tropopause) / (cls.gasConstant * temperature))
+        temperature += temperatureOffset
+        return temperature, pressure, pressure / (cls.gasConstant * temperature)
+
+    def __row(self, height):
+        """ Returns (index, fraction) of the table row at or below the height. """
+        position = height / self.step
+        if position <= 0:
+            return 0, 0.0
+        if position >= self.count - 1:
+            return self.count - 2, 1.0
+        index = int(position)
+        return index, position - index
+
+    def properties(self, height):
+        """ Returns (density, speed of sound) at the given height above the launch site, from a single lookup. """
+        index, fraction = self.__row(height)
+        density = self.density
+        speedOfSound = self.speedOfSound
+        return (density[index] + (density[index + 1] - density[index]) * fraction,
+                speedOfSound[index] + (speedOfSound[index + 1] - speedOfSound[index]) * fraction)
+
+    def densityAt(self, height):
+        """ kg/m^3 at the given height above the launch site. """
+        index, fraction = self.__row(height)
+        return self.density[index] + (self.density[index + 1] - self.density[index]) * fraction
+
+    def pressureAt(self, height):
+        """ Pa at the given height above the launch site. """
+        index, fraction = self.__row(height)
+        return self.pressure[index] + (self.pressure[index + 1] - self.pressure[index]) * fraction
+
+    def speedOfSoundAt(self, height):
+        """ m/s at the given height above the launch site. """
+        index, fraction = self.__row(height)
+        return self.speedOfSound[index] + (self.speedOfSound[index + 1] - self.speedOfSound[index]) * fraction
@@ -0,0 +1,218 @@
+##
+#   BatchEngine.py
+#
+#   Vectorized version of ThrustProfile and Rocket.launch that flies many configurations in a single pass.
+#   Requires numpy.
+##
+
+import numpy
+
+import Tank
+
+
+class BatchResult:
+    """ Per configuration results of a batch run. Every attribute is an array with one entry per configuration. The
+    burnout values are taken at the first step without thrust and the rest cover every step, as in FlightSummary. """
+    columnNames = ("apogee", "burnoutTime", "burnoutVelocity", "maxAcceleration", "flightTime", "burnoutHeight",
+                   "maxVelocity", "steps")
+
+    def __init__(self, apogee, burnoutTime, burnoutVelocity, maxAcceleration, flightTime, burnoutHeight,
+                 maxVelocity, steps, feasible=None):
+        self.apogee = apogee  # m
+        self.burnoutTime = burnoutTime  # s
+        self.burnoutVelocity = burnoutVelocity  # m/s
+        self.maxAcceleration = maxAcceleration  # m/s^2
+        self.flightTime = flightTime  # s, time at which apogee was detected
+        self.burnoutHeight = burnoutHeight  # m
+        self.maxVelocity = maxVelocity  # m/s
+        self.steps = steps  # Steps flown, up to and including apogee
+        self.feasible = feasible  # bool, whether the tank held; None if the batch was not screened
+
+    def __len__(self):
+        return len(self.apogee)
+
+    def scatter(self, feasible):
+        """ Spreads results for only the feasible configurations back over the whole batch, with nan for the rest.
+        :param feasible: array Mask over the whole batch.
+        :rtype : BatchResult
+        """
+        columns = []
+        for name in self.columnNames:
+            full = numpy.full(len(feasible), numpy.nan)
+            full[feasible] = getattr(self, name)
+            columns.append(full)
+        return BatchResult(*columns, feasible=feasible)
+
+
+class BatchEngine:
+    """ Integrates the burn, blowdown and coast of every configuration at once. Each configuration follows the
+    same steps as ThrustProfile.getThrustProfile followed by Rocket.launch, so results match the scalar solver. """
+    # Names of the Solver attributes that may vary across the batch.
+    parameters = ("airPressure", "airVolume", "waterVolume", "d_noz", "structuralMass", "payloadMass", "frontalArea",
+                  "dragScale", "tankRadius", "tankThickness")
+    # Constants (see Tank and Rocket)
+    p_atmosphere = Tank.Tank.p_atmosphere  # Pa
+    rho_water = Tank.Tank.rho_water  # kg/m^3
+    rho_air = 1.225 / (10 ** 4)  # kg/m^3
+    speedOfSound = 340.29  # m/s @ sea level
+    gravity = 9.81  # m/s^2
+    dt = 0.01  # s
+    maxTime = 600.0  # s, safety limit for configurations that never turn around
+    # Tank phases
+    BURN = Tank.Tank.BURN
+    BLOWDOWN = Tank.Tank.BLOWDOWN
+    DONE = Tank.Tank.DONE
+
+    def __init__(self, drag, dt=0.01, atmosphere=None):
+        """
+        :param drag: DragTable Drag coefficients shared by every configuration.
+        :param dt: float Time step for both the tank and the flight, in seconds.
+        :param atmosphere: Atmosphere Density, speed of sound and ambient pressure, or None for the constants above.
+        """
+        self.dt = dt
+        self.atmosphere = atmosphere
+        if atmosphere is not None:
+            self.p_atmosphere = atmosphere.pressureAt(0.0)
+            self.airDensity = numpy.array(atmosphere.density, dtype=float)
+            self.airSpeedOfSound = numpy.array(atmosphere.speedOfSound, dtype=float)
+        self.dragMach = numpy.array(drag.mach, dtype=float)
+        self.dragUnpowered = numpy.array(drag.unpowered, dtype=float)
+        self.dragPowered = numpy.array(drag.powered, dtype=float)
+
+    def prepare(self, defaults, configs):
+        """ Returns a dict of equal length float arrays for every parameter, using the attribute on defaults for
+        any parameter missing from configs. """
+        values = {}
+        for name in self.parameters:
+            values[name] = numpy.atleast_1d(numpy.asarray(configs.get(name, getattr(defaults, name)), dtype=float))
+        shape = numpy.broadcast(*[values[name] for name in self.parameters]).shape
+        for name in self.parameters:
+            values[name] = numpy.ascontiguousarray(numpy.broadcast_to(values[name], shape).ravel())
+        return values
+
+    def simulate(self, values):
+        """ Flies every configuration until apogee.
+        :param values: dict Parameter arrays as returned by prepare.
+        :rtype : BatchResult
+        """
+        dt = self.dt
+        p_atm = self.p_atmosphere
+        rho_water = self.rho_water
+        count = len(values["airPressure"])
+        area = Tank.Tank.nozzleArea(values["d_noz"])
+        rho_air = self.rho_air
+        speedOfSound = self.speedOfSound
+
+        # Tank. ThrustProfile.getThrustProfile stores the air volume as its water volume and the water volume as its
+        # air volume; mirror it so both solvers agree.
+        vol_air = values["waterVolume"].copy()
+        vol_total = values["airVolume"] + values["waterVolume"]
+        p_air = values["airPressure"].copy()
+        m_water = rho_water * values["airVolume"]
+        m_air = Tank.Tank.airMass(vol_air, p_air)
+        phase = numpy.zeros(count, dtype=int)  # BURN, BLOWDOWN or DONE
+
+        # Flight
+        y = numpy.zeros(count)
+        velocity = numpy.zeros(count)
+        acceleration = numpy.zeros(count)
+        maxAcceleration = numpy.zeros(count)
+        burnoutTime = numpy.zeros(count)
+        burnoutVelocity = numpy.zeros(count)
+        burnoutHeight = numpy.zeros(count)
+        maxVelocity = numpy.zeros(count)
+        steps = numpy.zeros(count, dtype=int)
+        flightTime = numpy.zeros(count)
+        powered = numpy.ones(count, dtype=bool)
+        flying = numpy.ones(count, dtype=bool)
+
+        time = 0.0
+        while flying.any() and time < self.maxTime:
+            time += dt
+            thrust = numpy.zeros(count)
+            fuelMass = numpy.zeros(count)
+            sampled = numpy.zeros(count, dtype=bool)
+
+            # Water burn: getThrustProfile steps while there is water left and stops early if the tank pressure
+            # falls below ambient.
+            if (phase == self.BURN).any():
+                phase[(phase == self.BURN) & ~(m_water > 0)] = self.BLOWDOWN
+                index = numpy.nonzero(phase == self.BURN)[0]
+                u_e, m_dot = Tank.Tank.waterFlow(p_air[index], p_atm, area[index], numpy.sqrt)
+                m_water[index] -= m_dot * dt
+                dv = m_dot * dt / rho_water
+                oldVolumeAir = vol_air[index]
+                vol_air[index] = oldVolumeAir + dv
+                p_air[index] *= (oldVolumeAir / vol_air[index]) ** Tank.Tank.gamma
+                thrust[index] = m_dot * u_e
+                fuelMass[index] = m_water[index] + m_air[index]
+                sampled[index] = True
+                phase[index[p_air[index] < p_atm]] = self.DONE
+
+            # Blowdown of the remaining air.
+            if (phase == self.BLOWDOWN).any():
+                phase[(phase == self.BLOWDOWN) & ~(p_air > p_atm)] = self.DONE
+                index = numpy.nonzero(phase == self.BLOWDOWN)[0]
+                u_e, m_dot = Tank.Tank.airFlow(p_air[index], p_atm, area[index], numpy.sqrt)
+                m_air[index] -= m_dot * dt
+                p_air[index] = Tank.Tank.airPressure(m_air[index], vol_total[index])
+                thrust[index] = Tank.Tank.blowdownThrust(m_dot, u_e, p_air[index], p_atm, area[index])
+                fuelMass[index] = m_water[index] + m_air[index]
+                sampled[index] = True
+
+            # Flight, exactly as Rocket.getNextPoint, operation for operation so the rounding matches too.
+            mass = fuelMass + values["structuralMass"] + values["payloadMass"]
+            if self.atmosphere is not None:
+                rho_air, speedOfSound = self.__air(y)
+            mach = velocity / speedOfSound
+            dragCoeff = self.__dragCoefficient(mach, powered) * values["dragScale"]
+            drag = dragCoeff * 0.5 * rho_air * values["frontalArea"] * velocity ** 2 + self.gravity * mass
+            newAcceleration = (thrust - drag) / mass
+            newVelocity = velocity + 0.5 * dt * (newAcceleration + acceleration)
+            newY = newVelocity * dt + y
+
+            acceleration = numpy.where(flying, newAcceleration, acceleration)
+            velocity = numpy.where(flying, newVelocity, velocity)
+            apogee = flying & (newY < y)
+            y = numpy.where(flying, newY, y)
+            maxAcceleration = numpy.where(flying, numpy.maximum(maxAcceleration, newAcceleration), maxAcceleration)
+            maxVelocity = numpy.where(flying, numpy.maximum(maxVelocity, newVelocity), maxVelocity)
+            steps += flying
+            flightTime[apogee] = time
+
+            # The burn time is the last sample of the profile. Like Rocket, drag switches to the unpowered
+            # coefficients after the first step past it.
+            burnedOut = flying & powered & ~sampled
+            burnoutTime[burnedOut] = time
+            burnoutVelocity[burnedOut] = newVelocity[burnedOut]
+            burnoutHeight[burnedOut] = newY[burnedOut]
+            powered &= sampled
+            flying &= ~apogee
+
+        return BatchResult(y, burnoutTime, burnoutVelocity, maxAcceleration, flightTime, burnoutHeight, maxVelocity,
+                           steps)
+
+    def __dragCoefficient(self, mach, powered):
+        """ Returns the drag coefficients for arrays of mach numbers and powered flags, interpolated exactly as
+        DragTable.coefficient (numpy.interp rounds differently). """
+        table = self.dragMach
+        if len(table) < 2:
+            return numpy.where(powered, self.dragPowered[0], self.dragUnpowered[0]) if len(table) else \
+                numpy.zeros(len(mach))
+        # Mach numbers outside of the table use the nearest entry.
+        index = numpy.clip(numpy.searchsorted(table, mach, side="right") - 1, 0, len(table) - 2)
+        fraction = numpy.clip((mach - table[index]) / (table[index + 1] - table[index]), 0.0, 1.0)
+        low = numpy.where(powered, self.dragPowered[index], self.dragUnpowered[index])
+        high = numpy.where(powered, self.dragPowered[index + 1], self.dragUnpowered[index + 1])
+        return numpy.where(mach >= table[-1], high, low + fraction * (high - low))
+
+    def __air(self, height):
+        """ Returns (density, speed of sound) arrays for an array of heights, as Atmosphere.properties. """
+        atmosphere = self.atmosphere
+        position = numpy.clip(height / atmosphere.step, 0, atmosphere.count - 1)
+        index = numpy.minimum(position.astype(int), atmosphere.count - 2)
+        fraction = position - index
+        density = self.airDensity
+        speedOfSound = self.airSpeedOfSound
+        return (density[index] + (density[index + 1] - density[index]) * fraction,
+                speedOfSound[index] + (speedOfSound[index + 1] - speedOfSound[index]) * fraction)
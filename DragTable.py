@@ -0,0 +1,77 @@
+##
+#   DragTable.py
+#
+#   Parsed drag coefficient table, shared by every solver in the process.
+##
+
+import os
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+
+
+class DragTable:
+    """ Drag coefficients by mach number, stored as sorted numeric columns.
+    The csv rows are {Mach, Unpowered Cd, Powered Cd}. """
+    # Process wide cache of parsed tables: {path: (mtime, DragTable)}
+    __cache = {}
+    __cacheLock = threading.Lock()
+
+    def __init__(self, rows):
+        """ Builds the table from (mach, unpowered, powered) rows in any order. """
+        rows = sorted(rows)
+        self.mach = array('d', [row[0] for row in rows])
+        self.unpowered = array('d', [row[1] for row in rows])
+        self.powered = array('d', [row[2] for row in rows])
+        self.count = len(self.mach)
+
+    @staticmethod
+    def parse(path):
+        """ Reads the drag csv at the given path and returns a new table. """
+        rows = []
+        dragfile = open(path, "r")
+        try:
+            for line in dragfile.read().splitlines():
+                values = line.split(',')
+                if len(values) < 3 or not values[0].strip():
+                    continue
+                try:
+                    rows.append((float(values[0]), float(values[1]), float(values[2])))
+                except ValueError:
+                    # Not stdout: in Server workers it carries the responses.
+                    sys.stderr.write("Row {0} could not be made into numbers.\n".format(line))
+        finally:
+            dragfile.close()
+        return DragTable(rows)
+
+    @staticmethod
+    def load(path="drag.csv"):
+        """ Returns the table for the given csv, parsing the file only if it has changed since it was last read. """
+        path = os.path.abspath(path)
+        with DragTable.__cacheLock:
+            mtime = os.path.getmtime(path)
+            cached = DragTable.__cache.get(path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            table = DragTable.parse(path)
+            DragTable.__cache[path] = (mtime, table)
+            return table
+
+    def coefficient(self, mach, powered):
+        """ Returns the drag coefficient interpolated to the given mach number. Mach numbers outside of the table
+        use the nearest entry.
+        :param mach: float Mach Number
+        :param powered: bool Whether or not the flight is powered.
+        :rtype : float Drag Value
+        """
+        if self.count == 0:
+            return 0.0
+        column = self.powered if powered else self.unpowered
+        if mach <= self.mach[0]:
+            return column[0]
+        if mach >= self.mach[-1]:
+            return column[-1]
+        index = bisect_right(self.mach, mach) - 1
+        fraction = (mach - self.mach[index]) / (self.mach[index + 1] - self.mach[index])
+        return column[index] + fraction * (column[index + 1] - column[index])
@@ -0,0 +1,34 @@
+
+class FlightState:
+    """ Snapshot of a flight that a Rocket can resume from, typically taken at burnout. """
+    time = 0.0  # s
+    y = 0.0  # m
+    velocity = 0.0  # m/s
+    acceleration = 0.0  # m/s^2
+    mass = 0.0  # kg
+    isPowered = True
+    isCruising = False
+    hasReachedApogee = False
+    burnTime = 0.0  # s
+    thrustCurve = None  # Only needed to resume before burnout.
+    tank = None  # Tank of the coupled engine, if it was used
+    summary = None  # FlightSummary up to this point
+
+    def __init__(self, point, isPowered, isCruising, hasReachedApogee, burnTime, thrustCurve, summary,
+                 tank=None):
+        """
+        :param point: Point The last point of the flight so far.
+        """
+        self.point = point
+        self.time = point.time
+        self.y = point.y
+        self.velocity = point.velocity
+        self.acceleration = point.acceleration
+        self.mass = point.mass
+        self.isPowered = isPowered
+        self.isCruising = isCruising
+        self.hasReachedApogee = hasReachedApogee
+        self.burnTime = burnTime
+        self.thrustCurve = thrustCurve
+        self.summary = summary
+        self.tank = tank
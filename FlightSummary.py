@@ -0,0 +1,32 @@
+
+class FlightSummary:
+    """ Running extrema and event values for a flight. Kept for every launch, even when the points are not. """
+    apogee = 0.0  # m
+    apogeeTime = 0.0  # s
+    burnoutTime = 0.0  # s
+    burnoutVelocity = 0.0  # m/s
+    burnoutHeight = 0.0  # m
+    maxVelocity = 0.0  # m/s
+    maxAcceleration = 0.0  # m/s^2
+    steps = 0
+
+    def __init__(self):
+        """ Default Constructor """
+
+    def update(self, point):
+        """ Folds the next point of the flight into the summary. """
+        self.steps += 1
+        if point.velocity > self.maxVelocity:
+            self.maxVelocity = point.velocity
+        if point.acceleration > self.maxAcceleration:
+            self.maxAcceleration = point.acceleration
+        if point.comment == "Apogee":
+            self.apogee = point.y
+            self.apogeeTime = point.time
+
+    def burnout(self, point):
+        """ Records the point at which the thrust ended: the first point the rocket flies unpowered. The rocket
+        calls this when it switches, whatever the integrator, engine or point comment. """
+        self.burnoutTime = point.time
+        self.burnoutVelocity = point.velocity
+        self.burnoutHeight = point.y
@@ -0,0 +1,142 @@
+##
+#   Instrumentation.py
+#
+#   Opt-in timers and counters for a single Solver run.
+##
+
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+
+class Instrumentation:
+    """ Collects per phase timings, step counts, lookup counts and misses, and file output for one run.
+    Rocket and Solver only touch it when one is attached, so runs without it pay a single None check per lookup.
+
+    Phases: "thrust profile", "burn" (water), "blowdown", "coast" and "output".
+    A drag miss is a mach number outside the drag table (the nearest entry is used). A thrust miss is a thrust
+    lookup after the end of the thrust curve while the rocket still counts as powered (0 is used).
+
+    With memory on, each flight phase also records, sampled at the phase boundaries:
+    - trajectoryBytes: what it added to the recorded trajectory, where the points of a flight are kept,
+    - rssBytes: the change in the process's resident set size (Linux only, else None), in whole pages,
+    - bytes and peakBytes: the traced bytes it left behind and its peak, where tracemalloc is tracing (else None). """
+    pageSize = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def __init__(self, memory=False):
+        """
+        :param memory: bool Measure memory per flight phase.
+        """
+        self.timers = {}  # {phase: seconds}
+        self.steps = {}  # {phase: steps}
+        self.counters = {"dragLookups": 0, "dragMisses": 0, "thrustLookups": 0, "thrustMisses": 0,
+                         "bytesWritten": 0, "filesWritten": 0}
+        self.memory = {} if memory else None  # {phase: {"trajectoryBytes": n, "rssBytes": n, ...}}
+        self.__phase = None
+        self.__phaseStart = 0.0
+        self.__trajectory = None
+        self.__trajectoryBytes = 0
+        self.__rss = None
+        self.__bytes = 0
+
+    def addTime(self, phase, seconds):
+        self.timers[phase] = self.timers.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def timer(self, phase):
+        """ Times the body of a with block as the given phase. """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.addTime(phase, time.time() - start)
+
+    # Rocket hooks
+    def dragLookup(self, mach, table):
+        self.counters["dragLookups"] += 1
+        if table.count == 0 or mach < table.mach[0] or mach > table.mach[-1]:
+            self.counters["dragMisses"] += 1
+
+    def thrustLookup(self, flightTime, curve):
+        self.counters["thrustLookups"] += 1
+        if flightTime > curve.burnTime:
+            self.counters["thrustMisses"] += 1
+
+    def startFlight(self, trajectory=None):
+        """
+        :param trajectory: Trajectory The points being recorded, or None if the flight keeps none.
+        """
+        self.__phase = "burn"
+        self.__trajectory = trajectory
+        if self.memory is not None:
+            self.__measureMemory(None)
+        self.__phaseStart = time.time()
+
+    def step(self, phase):
+        """ Counts a step of the flight in the given phase, switching phase timers as it passes burnout and the end
+        of blowdown. """
+        if phase != self.__phase:
+            now = time.time()
+            self.addTime(self.__phase, now - self.__phaseStart)
+            if self.memory is not None:
+                self.__measureMemory(self.__phase)
+            self.__phase, self.__phaseStart = phase, time.time()
+        self.steps[phase] = self.steps.get(phase, 0) + 1
+
+    def endFlight(self):
+        self.addTime(self.__phase, time.time() - self.__phaseStart)
+        if self.memory is not None:
+            self.__measureMemory(self.__phase)
+
+    @classmethod
+    def residentBytes(cls):
+        """ Returns the resident set size of the process (bytes), or None where /proc is not available. """
+        try:
+            statm = open("/proc/self/statm")
+        except IOError:
+            return None
+        try:
+            return int(statm.read().split()[1]) * cls.pageSize
+        finally:
+            statm.close()
+
+    def __measureMemory(self, phase):
+        """ Charges the memory change since the last boundary to the phase that just ended (None at the start).
+        Changes add up over flights, the peak is the largest rise within one phase. """
+        usage = self.memory.setdefault(phase, {"trajectoryBytes": 0, "rssBytes": None, "bytes": None,
+                                               "peakBytes": None})
+        trajectoryBytes = self.__trajectory.byteSize() if self.__trajectory is not None else 0
+        if phase is not None:
+            usage["trajectoryBytes"] += trajectoryBytes - self.__trajectoryBytes
+        self.__trajectoryBytes = trajectoryBytes
+        rss = self.residentBytes()
+        if rss is not None and self.__rss is not None:
+            usage["rssBytes"] = (usage["rssBytes"] or 0) + rss - self.__rss
+        self.__rss = rss
+        if tracemalloc is None or not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        usage["bytes"] = (usage["bytes"] or 0) + current - self.__bytes
+        if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+, before that the peak covers the whole run
+            usage["peakBytes"] = max(usage["peakBytes"] or 0, peak - self.__bytes)
+            tracemalloc.reset_peak()
+        self.__bytes = current
+
+    # Solver hooks
+    def fileWritten(self, byteCount, seconds):
+        self.counters["bytesWritten"] += byteCount
+        self.counters["filesWritten"] += 1
+        self.addTime("output", seconds)
+
+    def report(self):
+        """ Returns everything collected as a plain dict. """
+        report = {"timers": dict(self.timers), "steps": dict(self.steps), "counters": dict(self.counters)}
+        if self.memory is not None:
+            report["memory"] = dict((phase, dict(usage)) for phase, usage in self.memory.items()
+                                    if phase is not None)
+        return report
@@ -0,0 +1,102 @@
+##
+#   Integrator.py
+#
+#   Adaptive Runge-Kutta stepping and event location used by the rocket's "rk45" integrator.
+##
+
+
+class DormandPrince:
+    """ Embedded Runge-Kutta 5(4) (Dormand-Prince) stepper with error control.
+    The derivative is called as derivative(t, state) and must return a list the same length as state. """
+    # Butcher tableau
+    c = (0.0, 1.0 / 5, 3.0 / 10, 4.0 / 5, 8.0 / 9, 1.0, 1.0)
+    a = ((),
+         (1.0 / 5,),
+         (3.0 / 40, 9.0 / 40),
+         (44.0 / 45, -56.0 / 15, 32.0 / 9),
+         (19372.0 / 6561, -25360.0 / 2187, 64448.0 / 6561, -212.0 / 729),
+         (9017.0 / 3168, -355.0 / 33, 46732.0 / 5247, 49.0 / 176, -5103.0 / 18656),
+         (35.0 / 384, 0.0, 500.0 / 1113, 125.0 / 192, -2187.0 / 6784, 11.0 / 84))
+    # Fifth order weights minus the embedded fourth order weights.
+    e = (71.0 / 57600, 0.0, -71.0 / 16695, 71.0 / 1920, -17253.0 / 339200, 22.0 / 525, -1.0 / 40)
+
+    def __init__(self, derivative, relativeTolerance=1e-6, absoluteTolerance=1e-6, maxStep=1.0, minStep=1e-9):
+        self.derivative = derivative
+        self.relativeTolerance = relativeTolerance
+        self.absoluteTolerance = absoluteTolerance
+        self.maxStep = maxStep
+        self.minStep = minStep
+        self.steps = 0  # Accepted steps
+        self.rejected = 0
+
+    def step(self, t, state, slope, h):
+        """ Takes a single step of size h. The slope at the start of the step is reused (first same as last).
+        :rtype : tuple (new state, slope at the new state, scaled error norm)
+        """
+        stages = [slope]
+        size = len(state)
+        for i in range(1, 7):
+            weights = self.a[i]
+            trial = [state[j] + h * sum(weights[k] * stages[k][j] for k in range(i)) for j in range(size)]
+            stages.append(self.derivative(t + self.c[i] * h, trial))
+        # The last stage is evaluated at the fifth order solution.
+        newState = trial
+        error = 0.0
+        for j in range(size):
+            estimate = h * sum(self.e[k] * stages[k][j] for k in range(7))
+            scale = self.absoluteTolerance + self.relativeTolerance * max(abs(state[j]), abs(newState[j]))
+            error = max(error, abs(estimate) / scale)
+        return newState, stages[6], error
+
+    def advance(self, t, state, slope, h, limit=None):
+        """ Takes one accepted step, shrinking h until the error is within tolerance. The step never passes limit.
+        :rtype : tuple (new time, new state, new slope, suggested size of the next step)
+        """
+        while True:
+            h = min(max(h, self.minStep), self.maxStep)
+            if limit is not None and t + h >= limit:
+                h = limit - t
+            newState, newSlope, error = self.step(t, state, slope, h)
+            if error <= 1.0 or h <= self.minStep:
+                self.steps += 1
+                factor = 5.0 if error == 0.0 else min(5.0, max(0.2, 0.9 * error ** -0.2))
+                newTime = limit if limit is not None and t + h >= limit else t + h
+                return newTime, newState, newSlope, h * factor
+            self.rejected += 1
+            h *= max(0.2, 0.9 * error ** -0.2)
+
+
+def hermite(t0, state0, slope0, t1, state1, slope1, t):
+    """ Cubic Hermite interpolation of the state between the ends of a step. """
+    h = t1 - t0
+    s = (t - t0) / h
+    h00 = (1 + 2 * s) * (1 - s) ** 2
+    h10 = s * (1 - s) ** 2
+    h01 = s ** 2 * (3 - 2 * s)
+    h11 = s ** 2 * (s - 1)
+    return [h00 * y0 + h10 * h * f0 + h01 * y1 + h11 * h * f1
+            for y0, f0, y1, f1 in zip(state0, slope0, state1, slope1)]
+
+
+def findRoot(function, low, high, fLow, fHigh, tolerance=1e-10, maxIterations=60):
+    """ Finds a root of function between low and high, which must bracket a sign change (Illinois method). """
+    side = 0
+    x = low
+    for i in range(maxIterations):
+        if fHigh == fLow:
+            break
+        x = (low * fHigh - high * fLow) / (fHigh - fLow)
+        fx = function(x)
+        if fx == 0 or abs(high - low) < tolerance:
+            break
+        if (fx > 0) == (fHigh > 0):
+            high, fHigh = x, fx
+            if side == -1:
+                fLow /= 2
+            side = -1
+        else:
+            low, fLow = x, fx
+            if side == 1:
+                fHigh /= 2
+            side = 1
+    return x
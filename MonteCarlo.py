@@ -0,0 +1,168 @@
+##
+#   MonteCarlo.py
+#
+#   Dispersion analysis: flies many randomly perturbed copies of a Solver configuration.
+##
+
+import hashlib
+import multiprocessing
+import random
+
+import RocketTrajectoryCalculator
+import Statistics
+
+# Solver attributes that make up a configuration.
+attributes = RocketTrajectoryCalculator.attributes
+
+
+class Normal:
+    """ Normally distributed around the baseline value. """
+
+    def __init__(self, sigma, relative=False):
+        """
+        :param sigma: float Standard deviation, in the attribute's units or as a fraction of it if relative.
+        :param relative: bool Whether sigma is a fraction of the baseline value.
+        """
+        self.sigma = sigma
+        self.relative = relative
+
+    def sample(self, generator, baseline):
+        """ Draws one value using a random.Random. """
+        return generator.gauss(baseline, self.sigma * abs(baseline) if self.relative else self.sigma)
+
+    def sampleArray(self, generator, baseline, count):
+        """ Draws count values using a numpy RandomState. """
+        return generator.normal(baseline, self.sigma * abs(baseline) if self.relative else self.sigma, count)
+
+
+class Uniform:
+    """ Uniformly distributed within +/- halfWidth of the baseline value. """
+
+    def __init__(self, halfWidth, relative=False):
+        self.halfWidth = halfWidth
+        self.relative = relative
+
+    def __bounds(self, baseline):
+        width = self.halfWidth * abs(baseline) if self.relative else self.halfWidth
+        return baseline - width, baseline + width
+
+    def sample(self, generator, baseline):
+        low, high = self.__bounds(baseline)
+        return generator.uniform(low, high)
+
+    def sampleArray(self, generator, baseline, count):
+        low, high = self.__bounds(baseline)
+        return generator.uniform(low, high, count)
+
+
+def chunkSeed(seed, chunk):
+    """ Returns the seed for one chunk of a run, hashed from the run's seed and the chunk's index so that no two
+    (seed, chunk) pairs share their samples, as seed + chunk would for neighbouring seeds. Fits numpy's 32 bits. """
+    return int(hashlib.sha1("{0!r}:{1}".format(seed, chunk).encode("ascii")).hexdigest()[:8], 16)
+
+
+def simulateChunk(task):
+    """ Flies one chunk of samples and returns lists of (apogees, burnout velocities, peak hoop stresses).
+    Runs in the worker processes.
+    :param task: tuple (baseline, distributions, seed, count, vectorized)
+    """
+    baseline, distributions, seed, count, vectorized = task
+    solver = RocketTrajectoryCalculator.Solver()
+    for name, value in baseline.items():
+        setattr(solver, name, value)
+    if vectorized:
+        import numpy  # Only the vectorized path needs numpy.
+        import BatchEngine
+        generator = numpy.random.RandomState(seed)
+        values = dict((name, numpy.full(count, value, dtype=float)) for name, value in baseline.items()
+                      if name in BatchEngine.BatchEngine.parameters)
+        for name in sorted(distributions):
+            values[name] = distributions[name].sampleArray(generator, baseline[name], count)
+        result = solver.calculateBatch(values)
+        # Tank pressure is highest at fill, so that is where the hoop stress peaks.
+        hoopStress = values["airPressure"] * values["tankRadius"] / values["tankThickness"]
+        return list(result.apogee), list(result.burnoutVelocity), list(hoopStress)
+    generator = random.Random(seed)
+    apogees, velocities, stresses = [], [], []
+    for i in range(count):
+        for name in sorted(distributions):
+            setattr(solver, name, distributions[name].sample(generator, baseline[name]))
+        summary = solver.apogee()
+        apogees.append(summary.apogee)
+        velocities.append(summary.burnoutVelocity)
+        stresses.append(solver.rocket.hoopStressCurrent)
+    return apogees, velocities, stresses
+
+
+class MonteCarloResult:
+    """ Streaming statistics of a Monte Carlo run. """
+
+    def __init__(self, target, percentiles):
+        self.target = target  # m
+        self.apogee = Statistics.RunningStatistics(percentiles, target)
+        self.burnoutVelocity = Statistics.RunningStatistics(percentiles)
+        self.hoopStress = Statistics.RunningStatistics(percentiles)
+        self.samples = 0
+
+    def add(self, apogees, velocities, stresses):
+        self.apogee.extend(apogees)
+        self.burnoutVelocity.extend(velocities)
+        self.hoopStress.extend(stresses)
+        self.samples += len(apogees)
+
+    def probabilityOfExceeding(self):
+        """ Returns the fraction of flights with an apogee above the target height. """
+        return self.apogee.exceedance()
+
+
+class MonteCarlo:
+    """ Draws perturbed configurations around a Solver baseline and aggregates the results chunk by chunk, in chunk
+    order, so only the chunks still in flight (or finished ahead of an earlier one) are ever held in memory. """
+
+    def __init__(self, solver, distributions, seed=0):
+        """
+        :param solver: Solver Baseline configuration.
+        :param distributions: dict Normal or Uniform keyed by Solver attribute name. dragScale varies Cd.
+        :param seed: int Runs with the same seed and chunk size give the same samples and the same statistics, with
+        any number of processes.
+        """
+        self.baseline = dict((name, getattr(solver, name)) for name in attributes)
+        self.distributions = distributions
+        self.seed = seed
+
+    def tasks(self, samples, chunkSize, vectorized):
+        chunk = 0
+        while chunk * chunkSize < samples:
+            count = min(chunkSize, samples - chunk * chunkSize)
+            yield self.baseline, self.distributions, chunkSeed(self.seed, chunk), count, vectorized
+            chunk += 1
+
+    def run(self, samples, target=0.0, processes=None, vectorized=False, chunkSize=None,
+            percentiles=(5, 50, 95)):
+        """ Flies the given number of samples.
+        :param samples: int Number of configurations to fly.
+        :param target: float Height (m) to report the probability of exceeding.
+        :param processes: int Worker processes. Defaults to the number of CPUs; 1 runs in process.
+        :param vectorized: bool Fly each chunk with Solver.calculateBatch (requires numpy).
+        :param chunkSize: int Samples per task. Defaults to 10000 when vectorized, otherwise 100.
+        :param percentiles: list Percentiles to estimate.
+        :rtype : MonteCarloResult
+        """
+        if chunkSize is None:
+            chunkSize = 10000 if vectorized else 100
+        processes = processes or multiprocessing.cpu_count()
+        result = MonteCarloResult(target, percentiles)
+        tasks = self.tasks(samples, chunkSize, vectorized)
+        if processes == 1:
+            for task in tasks:
+                result.add(*simulateChunk(task))
+            return result
+        pool = multiprocessing.Pool(processes)
+        try:
+            # In chunk order: the percentile estimates depend on the order the samples arrive in.
+            for chunk in pool.imap(simulateChunk, tasks):
+                result.add(*chunk)
+        finally:
+            pool.close()
+            pool.join()
+        return result
@@ -1,22 +1,17 @@
 
-class Point:
+class Point(object):
     """ Model for a point. """
-    time = 0.0
-    acceleration = 0.0
-    velocity = 0.0
-    x = 0.0
-    y = 0.0
-    drag = 0.0
-    thrust = 0.0
-    mach = 0.0
-    mass = 0.0
-    comment = ""
+    __slots__ = ("time", "acceleration", "velocity", "x", "y", "drag", "thrust", "mach", "mass", "comment")
 
-    def __init__(self, _x, _y, _time, _velocity, _acceleration, _comment):
+    def __init__(self, _x, _y, _time, _velocity, _acceleration, _comment, _drag=0.0, _thrust=0.0, _mach=0.0,
+                 _mass=0.0):
         self.time = _time
         self.x = _x
         self.y = _y
         self.velocity = _velocity
         self.acceleration = _acceleration
         self.comment = _comment
-
+        self.drag = _drag
+        self.thrust = _thrust
+        self.mach = _mach
+        self.mass = _mass
@@ -0,0 +1,225 @@
+##
+#   ResultsStore.py
+#
+#   Append only SQLite store of flight results, keyed on the full Solver configuration and the code that flew it.
+##
+
+import hashlib
+import os
+import sqlite3
+import time
+
+import RocketTrajectoryCalculator
+import Sweep
+
+# Inputs that determine a flight. Together with the code version and the drag table they make up the key.
+numericParameters = ("airPressure", "airVolume", "waterVolume", "structuralMass", "payloadMass", "frontalArea",
+                     "tankThickness", "tankRadius", "d_noz", "dragScale", "dt")
+textParameters = ("integrator", "engine", "atmosphere")
+# Outputs, as in FlightSummary.
+resultColumns = ("apogee", "apogeeTime", "burnoutTime", "burnoutVelocity", "burnoutHeight", "maxVelocity",
+                 "maxAcceleration", "steps")
+# Modules whose source changes the results.
+physicsModules = ("AnalyticProfile.py", "Atmosphere.py", "BatchEngine.py", "DragTable.py", "FlightSummary.py",
+                  "Integrator.py", "Point.py", "Rocket.py", "RocketTrajectoryCalculator.py", "Tank.py",
+                  "ThrustCurve.py", "ThrustProfile.py", "ThrustProfileCache.py")
+
+
+def codeVersion():
+    """ Returns a hash of the physics modules, so results from older code are never mistaken for current ones. """
+    digest = hashlib.sha1()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in physicsModules:
+        sourceFile = open(os.path.join(directory, name), "rb")
+        try:
+            digest.update(sourceFile.read())
+        finally:
+            sourceFile.close()
+    return digest.hexdigest()[:16]
+
+
+def summarizeChunk(configs):
+    """ Flies a list of configurations and returns a list of (config, FlightSummary). Runs in the worker processes. """
+    results = []
+    for config in configs:
+        solver = RocketTrajectoryCalculator.Solver()
+        for name, value in config.items():
+            setattr(solver, name, value)
+        results.append((config, solver.apogee()))
+    return results
+
+
+class ResultsStore:
+    """ Results of every flight ever stored, one row each, never overwritten. Rows are keyed on the inputs in
+    numericParameters and textParameters, the code version and the contents of the drag table, so a lookup only
+    finds results that would be reproduced exactly. Every input column is indexed for analysis queries. """
+
+    def __init__(self, path="results.sqlite", version=None):
+        """
+        :param path: str Database file, created if missing.
+        :param version: str Code version to store and look up results under. Defaults to codeVersion().
+        """
+        self.path = path
+        self.version = version or codeVersion()
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.__dragHashes = {}  # {path: (mtime, hash)}
+        self.__keyColumns = ("version", "drag") + numericParameters + textParameters
+        self.__columns = self.__keyColumns + resultColumns + ("created",)
+        self.__createTables()
+
+    def __createTables(self):
+        cursor = self.connection.cursor()
+        if self.path != ":memory:":
+            cursor.execute("PRAGMA journal_mode=WAL")
+        definitions = (["version TEXT NOT NULL", "drag TEXT NOT NULL"] +
+                       ["{0} REAL NOT NULL".format(name) for name in numericParameters] +
+                       ["{0} TEXT NOT NULL".format(name) for name in textParameters] +
+                       ["{0} REAL".format(name) for name in resultColumns] + ["created REAL"])
+        cursor.execute("CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY, {0})".format(
+            ", ".join(definitions)))
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS results_key ON results ({0})".format(
+            ", ".join(self.__keyColumns)))
+        for name in numericParameters + textParameters + ("apogee",):
+            cursor.execute("CREATE INDEX IF NOT EXISTS results_{0} ON results ({0})".format(name))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def __dragHash(self, path):
+        path = os.path.abspath(path)
+        mtime = os.path.getmtime(path)
+        cached = self.__dragHashes.get(path)
+        if cached is None or cached[0] != mtime:
+            dragFile = open(path, "rb")
+            try:
+                cached = mtime, hashlib.sha1(dragFile.read()).hexdigest()[:16]
+            finally:
+                dragFile.close()
+            self.__dragHashes[path] = cached
+        return cached[1]
+
+    @staticmethod
+    def __atmosphereKey(atmosphere):
+        if atmosphere is None:
+            return ""
+        return "elevation={0!r};step={1!r};ceiling={2!r};temperatureOffset={3!r}".format(
+            atmosphere.elevation, atmosphere.step, atmosphere.ceiling, atmosphere.temperatureOffset)
+
+    def key(self, config):
+        """ Returns the key columns' values for a dict of Solver attribute values (e.g. from Sweep.configuration).
+        Missing attributes take the Solver defaults. """
+        defaults = RocketTrajectoryCalculator.Solver
+        values = [self.version, self.__dragHash(config.get("dragPath", defaults.dragPath))]
+        values.extend(float(config.get(name, getattr(defaults, name))) for name in numericParameters)
+        values.append(config.get("integrator", defaults.integrator))
+        values.append(config.get("engine", defaults.engine))
+        values.append(self.__atmosphereKey(config.get("atmosphere", defaults.atmosphere)))
+        return tuple(values)
+
+    def lookup(self, config):
+        """ Returns the stored row for the configuration as a dict, or None if it has not been flown. """
+        row = self.connection.execute(
+            "SELECT * FROM results WHERE {0}".format(" AND ".join(name + " = ?" for name in self.__keyColumns)),
+            self.key(config)).fetchone()
+        return dict(zip(row.keys(), row)) if row is not None else None
+
+    def addMany(self, results):
+        """ Stores many results in a single transaction. Results already in the store are left as they are.
+        :param results: list (config, summary) where summary is a FlightSummary or a dict with any of resultColumns.
+        :rtype : int Rows added.
+        """
+        now = time.time()
+        rows = []
+        for config, summary in results:
+            if not isinstance(summary, dict):
+                summary = dict((name, getattr(summary, name)) for name in resultColumns)
+            rows.append(self.key(config) + tuple(summary.get(name) for name in resultColumns) + (now,))
+        before = self.connection.total_changes
+        with self.connection:
+            self.connection.executemany("INSERT OR IGNORE INTO results ({0}) VALUES ({1})".format(
+                ", ".join(self.__columns), ", ".join("?" * len(self.__columns))), rows)
+        return self.connection.total_changes - before
+
+    def add(self, config, summary):
+        return self.addMany([(config, summary)])
+
+    def addBatch(self, solver, configs, result):
+        """ Stores a BatchResult from Solver.calculateBatch. Each row is keyed on the solver's settings with the
+        configuration's batch parameters on top, since the solver decides the time step, integrator, engine,
+        atmosphere and drag table the batch flew with.
+        :param solver: Solver The solver calculateBatch was called on.
+        :param configs: list Dict of Solver attribute values for each configuration in the batch.
+        """
+        import BatchEngine  # Only batch runs need numpy.
+        settings = dict((name, getattr(solver, name)) for name in RocketTrajectoryCalculator.attributes)
+        results = []
+        for i, config in enumerate(configs):
+            for name, value in config.items():
+                if name in BatchEngine.BatchEngine.parameters or name not in settings:
+                    continue
+                same = (self.__atmosphereKey(value) == self.__atmosphereKey(settings[name]) if name == "atmosphere"
+                        else value == settings[name])
+                if not same:
+                    raise ValueError("Configuration {0} has {1}={2!r}, but the batch flew with {3!r}".format(
+                        i, name, value, settings[name]))
+            if result.apogee[i] != result.apogee[i]:
+                continue  # nan, screened out
+            flown = dict(settings)
+            flown.update(config)
+            results.append((flown, {"apogee": float(result.apogee[i]), "apogeeTime": float(result.flightTime[i]),
+                                     "burnoutTime": float(result.burnoutTime[i]),
+                                     "burnoutVelocity": float(result.burnoutVelocity[i]),
+                                     "burnoutHeight": float(result.burnoutHeight[i]),
+                                     "maxVelocity": float(result.maxVelocity[i]),
+                                     "maxAcceleration": float(result.maxAcceleration[i]),
+                                     "steps": int(result.steps[i])}))
+        return self.addMany(results)
+
+    def evaluate(self, configs, processes=1, chunksize=None):
+        """ Returns the stored row for every configuration, flying (across a worker pool) and storing only the ones
+        that are not in the store yet.
+        :rtype : list Row dicts in the same order as configs.
+        """
+        rows = [self.lookup(config) for config in configs]
+        missing = [config for config, row in zip(configs, rows) if row is None]
+        if missing:
+            self.addMany(Sweep.evaluateAll(missing, processes, chunksize, summarizeChunk))
+            rows = [row if row is not None else self.lookup(config) for config, row in zip(configs, rows)]
+        return rows
+
+    def query(self, where=None, parameters=(), orderBy=None, limit=None, allVersions=False):
+        """ Returns rows as dicts, e.g. query("d_noz = ?", (0.0127,), "apogee DESC", 1) for the best design with a
+        half inch nozzle. Only rows for the current code version are searched unless allVersions is set. """
+        clauses = []
+        arguments = list(parameters)
+        if not allVersions:
+            clauses.append("version = ?")
+            arguments.insert(0, self.version)
+        if where:
+            clauses.append("(" + where + ")")
+        sql = "SELECT * FROM results"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        if orderBy:
+            sql += " ORDER BY " + orderBy
+        if limit is not None:
+            sql += " LIMIT {0:d}".format(limit)
+        return [dict(zip(row.keys(), row)) for row in self.connection.execute(sql, arguments)]
+
+    def best(self, **equals):
+        """ Returns the row with the highest apogee among those whose inputs equal the given values, or None. """
+        names = sorted(equals)
+        rows = self.query(" AND ".join(name + " = ?" for name in names), [equals[name] for name in names],
+                          "apogee DESC", 1)
+        return rows[0] if rows else None
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
@@ -6,25 +6,43 @@
 #
 ##
 
+import copy
+from array import array
+
+import FlightState
+import FlightSummary
+import Integrator
 import Point
+import ThrustCurve
+import Trajectory
 
 
 class Rocket:
     """ Put comment here. """
     # Constants
     __speedOfSound = 340.29  # m/s @ sea level
-    # Bookkeeping
-    __points = []
+    __airDensity = 1.225 / (10 ** 4)  # kg/m^3
+    # Bookkeeping (per launch, see reset)
+    __points = None  # Trajectory
     __previousPoint = Point.Point(0, 0, 0, 0, 0, "Launch Point")
     __apogeePoint = Point.Point(0, 0, 0, 0, 0, "")
     __burnoutPoint = Point.Point(0, 0, 0, 0, 0, "")
     __impactPoint = Point.Point(0, 0, 0, 0, 0, "")
     __flightTime = 0  # seconds
-    __dt = 0.01  # seconds
+    dt = 0.01  # seconds
+    # Integration
+    integrator = "fixed"  # "fixed" steps of dt, or adaptive "rk45"
+    tolerance = 1e-6  # Relative and absolute error allowed per rk45 step
     # Data
-    drag = []
-    thrust = []
-    flightStats = []
+    drag = None  # DragTable
+    flightStats = None
+    thrustCurve = None
+    engine = "profile"  # Replay the "profile" thrust curve, or carry the tank in the flight state ("coupled")
+    tank = None  # Tank at ignition, for the coupled engine
+    record = True  # Keep every point, or only the summary
+    summary = None  # FlightSummary
+    instrumentation = None  # Instrumentation, or None to skip the bookkeeping
+    atmosphere = None  # Atmosphere, or None for the constant density and speed of sound above
     # Status
     hasReachedApogee = False
     hasLaunched = False
@@ -37,13 +55,15 @@ class Rocket:
     burnTime = 0.0  # s
     currentMass = 0.0  # kg
     frontalArea = 0.1  # m^2
+    dragScale = 1.0  # Multiplier on the tabulated drag coefficients
     length = 0.0  # m
     # Tank Stats
     volume = 0.0  # m^3
     hoopStressCurrent = 0.0
     longStressCurrent = 0.0
-    hoopStress = []
-    longStress = []
+    hoopStress = None
+    longStress = None
+    tankPressure = None  # Pa, the coupled engine's tank pressure at each recorded point of the burn
     tankThickness = 0.0
     tankRadius = 0.0
 
@@ -51,74 +71,290 @@ class Rocket:
     def __init__(self):
         """ Default Constructor """
         self.ready = True
+        self.flightStats = []
+        self.reset()
+
+    def reset(self):
+        """ Clears everything left over from the last launch so the rocket can be launched again. The drag table,
+        thrust profile and structure are kept. """
+        self.__points = Trajectory.Trajectory()
+        self.__previousPoint = Point.Point(0, 0, 0, 0, 0, "Launch Point")
+        self.__flightTime = 0
+        self.hasReachedApogee = False
+        self.hasLaunched = False
+        self.isPowered = True
+        self.isCruising = False
+        self.burnTime = 0.0
+        self.currentMass = 0.0
+        self.summary = FlightSummary.FlightSummary()
+        self.hoopStress = []
+        self.longStress = []
+        self.tankPressure = array('d')
+        self.__tank = None  # The coupled engine's tank during this launch
+        self.__resuming = False
+
+    def checkpoint(self):
+        """ Returns a snapshot of the flight so far, which resume() can continue from any number of times.
+        :rtype : FlightState
+        """
+        return FlightState.FlightState(self.__previousPoint, self.isPowered, self.isCruising, self.hasReachedApogee,
+                                       self.burnTime, self.thrustCurve, copy.copy(self.summary),
+                                       copy.copy(self.__tank))
+
+    def resume(self, state):
+        """ Restores a checkpoint so that the next launch continues from it instead of from the pad. The drag table,
+        structure and other inputs of this rocket are used from there on.
+        :param state: FlightState
+        """
+        self.reset()
+        self.__previousPoint = state.point
+        self.__flightTime = state.time
+        self.isPowered = state.isPowered
+        self.isCruising = state.isCruising
+        self.hasReachedApogee = state.hasReachedApogee
+        self.burnTime = state.burnTime
+        if state.thrustCurve is not None:
+            self.thrustCurve = state.thrustCurve
+        self.summary = copy.copy(state.summary)
+        self.__tank = copy.copy(state.tank)
+        self.__resuming = True
 
     def __dragForMach(self, mach, powered):
-        """ Determines the drag value for the given mach number. The mach number is accurate to 5%
+        """ Determines the drag value for the given mach number, interpolated from the drag table.
         :param mach: float Mach Number
         :param powered: bool Whether or not the flight is powered.
         :rtype : float Drag Value
         """
-        acceptableError = 0.05
-        for drag in self.drag:
-            try:
-                machFromDrag = float(drag[0])
-            except FloatingPointError:
-                print "Value {0} could not be made into a number.".format(drag[0])
-            percentError = abs(mach - machFromDrag) / (mach + machFromDrag)
-            if percentError <= acceptableError:
-                # Result found
-                if powered:
-                    return float(drag[2])
-                if not powered:
-                    return float(drag[1])
-        return 0
+        if self.instrumentation is not None:
+            self.instrumentation.dragLookup(mach, self.drag)
+        return self.drag.coefficient(mach, powered) * self.dragScale
+
+    def __air(self, height):
+        """ Returns (density, speed of sound) at the given height. """
+        if self.atmosphere is None:
+            return self.__airDensity, self.__speedOfSound
+        return self.atmosphere.properties(height)
 
     def __thrust(self, time):
         """ Returns the thrust value for the given time value. """
-        for moment in self.flightStats:
-            if time == moment[0]:  # Find the correct time in the list of thrust profile info.
-                return int(moment[1])
-        return 0
+        if self.instrumentation is not None:
+            self.instrumentation.thrustLookup(time, self.thrustCurve)
+        return self.thrustCurve.thrustAt(time)
 
     def __massflow(self, time):
         """ Returns the mass flow value for the given time.
-        :param time: int Burn time in seconds
-        :rtype : int
+        :param time: float Burn time in seconds
+        :rtype : float
         """
-        for moment in self.flightStats:
-            if time == moment[0]:  # Find the correct time in the list of mass flow profile info.
-                return int(moment[2])
-
-        return 0
+        return self.thrustCurve.massflowAt(time)
 
     def __fuelMass(self, time):
         """ Returns the mass value for the given time.
-        :param time: int Burn time in seconds
-        :rtype : int
+        :param time: float Burn time in seconds
+        :rtype : float
         """
-        for moment in self.flightStats:
-            if time == moment[0]:  # Find the correct time in the list of mass profile info.
-                return int(moment[3])
-        return 0
+        return self.thrustCurve.massAt(time)
+
+    def __tankStep(self):
+        """ Advances the coupled engine's tank by one step and returns its fuel mass, or 0 once the thrust has ended.
+        The burn time follows the last step with thrust. """
+        if self.__tank.step(self.dt):
+            self.burnTime = self.__flightTime
+            if self.record:
+                self.tankPressure.append(self.__tank.p_air)
+            return self.__tank.fuelMass()
+        return 0.0
+
+    def __propulsion(self, time, state):
+        """ Returns (thrust, mass, tank slope) for the adaptive integrator's state at the given time. The tank slope
+        is empty unless the engine is coupled. """
+        dryMass = self.structuralMass + self.payloadMass
+        tank = self.__tank
+        if tank is not None:
+            thrust, tankSlope = tank.derivative(state[2:])
+            if tank.phase == tank.DONE:
+                return thrust, dryMass, tankSlope
+            return thrust, state[2] + state[4] + dryMass, tankSlope
+        if self.isPowered:
+            return self.__thrust(time), self.__fuelMass(time) + dryMass, []
+        return 0.0, dryMass, []
+
+    def __phase(self, time):
+        """ Returns the part of the flight ("burn", "blowdown" or "coast") the given time is in. """
+        if self.__tank is not None:
+            return ("burn", "blowdown", "coast")[self.__tank.phase] if self.isPowered else "coast"
+        if time <= self.thrustCurve.burnoutTime:
+            return "burn"
+        if time <= self.thrustCurve.burnTime:
+            return "blowdown"
+        return "coast"
 
     def __burnTime(self):
         if self.burnTime == 0.0:
-            moment = self.flightStats[-1]
-            self.burnTime = moment[0]
-            return int(moment[0])
-        else:
-            return self.burnTime
+            self.burnTime = self.thrustCurve.burnTime
+        return self.burnTime
 
     # Public Methods
-    def launch(self):
-        """ Launches the rocket. Once this is finished the points are available for use. """
+    def launch(self, sinks=()):
+        """ Launches the rocket. Once this is finished the points are available for use.
+        :param sinks: list Sinks (see Sinks.py) that are handed every point as it is calculated.
+        """
+        stats = self.instrumentation
+        if stats is not None:
+            stats.startFlight(self.__points if self.record else None)
+        for point in self.steps():
+            if self.record:
+                self.__points.appendPoint(point)
+            for sink in sinks:
+                sink.write(point)
+            if stats is not None:
+                stats.step(self.__phase(point.time))
+        if stats is not None:
+            stats.endFlight()
+
+    def launchToBurnout(self):
+        """ Flies until the thrust has ended and returns a checkpoint there, for coast phase variants to resume.
+        :rtype : FlightState
+        """
+        for point in self.steps():
+            if self.record:
+                self.__points.appendPoint(point)
+            if not self.isPowered:
+                break
+        return self.checkpoint()
+
+    def steps(self):
+        """ Flies the rocket, yielding each Point as it is calculated. Nothing is kept, and the flight ends early if
+        the caller stops iterating. """
+        if self.hasLaunched and not self.__resuming:
+            self.reset()
+        self.__resuming = False
         self.hasLaunched = True
-        self.__burnTime()
+        if self.engine == "coupled":
+            if self.__tank is None:
+                self.__tank = copy.copy(self.tank)
+        else:
+            if self.thrustCurve is None:
+                self.thrustCurve = ThrustCurve.ThrustCurve(self.flightStats)
+            self.__burnTime()
+        if self.integrator == "rk45":
+            for point in self.__adaptiveSteps():
+                yield point
+            return
+        while not self.hasReachedApogee:
+            self.__flightTime += self.dt
+            point = self.getNextPoint()
+            self.summary.update(point)
+            self.__previousPoint = point
+            yield point
+
+    def __derivative(self, time, state):
+        """ Returns [velocity, acceleration] for the state [y, velocity] at the given time. """
+        velocity = state[1]
+        rho, speedOfSound = self.__air(state[0])
+        thrust, mass, tankSlope = self.__propulsion(time, state)
+        dragCoeff = self.__dragForMach(velocity / speedOfSound, self.isPowered)
+        aerodrag = dragCoeff * 0.5 * rho * self.frontalArea * (velocity ** 2)
+        return [velocity, (thrust - aerodrag - 9.81 * mass) / mass] + tankSlope
+
+    def __makePoint(self, time, state, slope, comment):
+        point = Point.Point(0, state[0], time, state[1], slope[1], comment)
+        point.mach = state[1] / self.__air(state[0])[1]
+        point.thrust, point.mass = self.__propulsion(time, state)[:2]
+        if self.__tank is not None:
+            self.__tank.setState(state[2:])
+            if self.record and self.isPowered:
+                self.tankPressure.append(self.__tank.p_air)
+        point.drag = point.thrust - slope[1] * point.mass - 9.81 * point.mass
+        self.currentMass = point.mass
+        self.__flightTime = time
+        self.__previousPoint = point
+        self.summary.update(point)
+        return point
+
+    def __adaptiveSteps(self):
+        """ Flies with an embedded Runge-Kutta 5(4) integrator. Steps end exactly on the burnout (water exhausted)
+        and blowdown events, taken from the thrust curve or, for the coupled engine, located in the tank state, and
+        apogee is located by finding the root of the velocity inside the step where it changes sign. """
+        stepper = Integrator.DormandPrince(self.__derivative, self.tolerance, self.tolerance)
+        tank = self.__tank
+        time = self.__flightTime
+        state = [self.__previousPoint.y, self.__previousPoint.velocity]
+        if tank is None:
+            events = [(self.thrustCurve.burnoutTime, "Burnout Reached"), (self.burnTime, "Blowdown Complete")]
+        else:
+            events = []
+            state += tank.state()
+        slope = self.__derivative(time, state)
+        step = self.dt
         while not self.hasReachedApogee:
-            self.__flightTime += self.__dt
-            self.__points.append(self.getNextPoint())
+            pending = [event for event in events if event[0] > time]
+            limit = pending[0][0] if pending else None
+            newTime, newState, newSlope, step = stepper.advance(time, state, slope, step, limit)
+            tankEvent = None
+            if tank is not None and tank.phase != tank.DONE:
+                crossing = self.__tankEvent(time, state, slope, newTime, newState, newSlope)
+                if crossing is not None:
+                    newTime, newState, tankEvent = crossing
+                    newSlope = self.__derivative(newTime, newState)
+            if newState[1] <= 0:
+                # Apogee is inside this step (or the rocket never left the pad).
+                if time > 0 and state[1] > 0:
+                    apogeeTime = Integrator.findRoot(
+                        lambda t: Integrator.hermite(time, state, slope, newTime, newState, newSlope, t)[1],
+                        time, newTime, state[1], newState[1])
+                    newState = Integrator.hermite(time, state, slope, newTime, newState, newSlope, apogeeTime)
+                    newTime = apogeeTime
+                    newSlope = self.__derivative(newTime, newState)
+                self.hasReachedApogee = True
+                yield self.__makePoint(newTime, newState, newSlope, "Apogee")
+                break
+            comment = ""
+            wasPowered = self.isPowered
+            if pending and newTime == limit:
+                comment = pending[0][1]
+                if limit == self.burnTime:
+                    # Thrust ends here, so restart the slope on the unpowered side.
+                    self.isPowered = False
+                    self.isCruising = True
+                    newSlope = self.__derivative(newTime, newState)
+            if tankEvent is not None:
+                comment = "Burnout Reached" if tank.phase == tank.BURN else "Blowdown Complete"
+                tank.nextPhase(newState[2:], tankEvent)
+                if tank.phase == tank.DONE:
+                    self.burnTime = newTime
+                    self.isPowered = False
+                    self.isCruising = True
+                newSlope = self.__derivative(newTime, newState)
+            point = self.__makePoint(newTime, newState, newSlope, comment)
+            if wasPowered and not self.isPowered:
+                self.summary.burnout(point)
+            yield point
+            time, state, slope = newTime, newState, newSlope
+
+    def __tankEvent(self, time, state, slope, newTime, newState, newSlope):
+        """ Returns (time, state, event index) of the first tank event inside the step, or None. """
+        tank = self.__tank
+        before = tank.events(state[2:])
+        after = tank.events(newState[2:])
+        first = None
+        for index in range(len(before)):
+            if before[index] > 0 >= after[index]:
+                eventTime = Integrator.findRoot(
+                    lambda t: tank.events(Integrator.hermite(time, state, slope, newTime, newState, newSlope,
+                                                             t)[2:])[index],
+                    time, newTime, before[index], after[index])
+                if first is None or eventTime < first[0]:
+                    first = eventTime, index
+        if first is None:
+            return None
+        eventTime, index = first
+        return eventTime, Integrator.hermite(time, state, slope, newTime, newState, newSlope, eventTime), index
 
     def getAllPoints(self):
+        """ Returns the trajectory. Indexing or iterating it gives Point objects.
+        :rtype : Trajectory
+        """
         return self.__points
 
     def getNextPoint(self):
@@ -128,32 +364,33 @@ class Rocket:
         :rtype Point: Point the next point in the trajectory.
         """
         point = Point.Point(0, 0, 0, 0, 0, "")
-        if len(self.__points) > 0:
-            prevPoint = self.__previousPoint = self.__points[-1]
-        else:
-            prevPoint = self.__previousPoint
-        rho = 1.225 / (10 ** 4)  # kg/m^3
-        mach = prevPoint.velocity / self.__speedOfSound
+        prevPoint = self.__previousPoint
+        rho, speedOfSound = self.__air(prevPoint.y)
+        mach = prevPoint.velocity / speedOfSound
 
-        self.currentMass = self.__fuelMass(self.__flightTime) + self.structuralMass + self.payloadMass
+        if self.__tank is None:
+            fuelMass = self.__fuelMass(self.__flightTime)
+        else:
+            fuelMass = self.__tankStep()
+        self.currentMass = fuelMass + self.structuralMass + self.payloadMass
         dragCoeff = self.__dragForMach(mach, self.isPowered)
         aerodrag = dragCoeff * 0.5 * rho * self.frontalArea * (
             prevPoint.velocity ** 2)
         drag = aerodrag + 9.81 * self.currentMass
         if self.isPowered:
             # Powered Climb
-            thrust = self.__thrust(self.__flightTime)
+            thrust = self.__thrust(self.__flightTime) if self.__tank is None else self.__tank.thrust
             acceleration = (thrust - drag) / self.currentMass
-            vel = prevPoint.velocity + 0.5 * self.__dt * (acceleration + prevPoint.acceleration)
-            y = vel * self.__dt + prevPoint.y
+            vel = prevPoint.velocity + 0.5 * self.dt * (acceleration + prevPoint.acceleration)
+            y = vel * self.dt + prevPoint.y
             x = 0  # The rocket is being launched at a 90 degree angle to the ground. Ignoring wind, there is no
             # horizontal travel.
         else:
             # Cruising Upward
             thrust = 0.0
             acceleration = (thrust - drag) / self.currentMass
-            vel = prevPoint.velocity + 0.5 * self.__dt * (prevPoint.acceleration + acceleration)
-            y = vel * self.__dt + prevPoint.y  # We can do this since there is no horizontal motion.
+            vel = prevPoint.velocity + 0.5 * self.dt * (prevPoint.acceleration + acceleration)
+            y = vel * self.dt + prevPoint.y  # We can do this since there is no horizontal motion.
             x = 0
 
         point.x = x
@@ -162,6 +399,7 @@ class Rocket:
         point.acceleration = acceleration
         point.drag = aerodrag
         point.thrust = thrust
+        point.mach = mach
         point.time = self.__flightTime
         point.mass = self.currentMass
 
@@ -173,13 +411,18 @@ class Rocket:
             self.isPowered = False
             self.isCruising = True
             point.comment = "Burnout Reached"
+            self.summary.burnout(point)
 
         return point
 
     def calcLength(self):
         """ Calculate the length of the rocket. """
-        moment = self.flightStats[0]
-        vol_total = moment[6] + moment[7]
+        if self.engine == "coupled":
+            vol_total = self.tank.volume
+        else:
+            if self.thrustCurve is None:
+                self.thrustCurve = ThrustCurve.ThrustCurve(self.flightStats)
+            vol_total = self.thrustCurve.volume
         length = vol_total / self.frontalArea  # Assumes the same shape over the length of the rocket.
         self.length = length
         self.volume = vol_total
@@ -7,9 +7,24 @@
 ##
 
 import Point
+import DragTable
+import Instrumentation
 import ThrustProfile
 import Rocket
+import Sinks
+import Structures
+import Tank
+import ThrustCurve
+import ThrustProfileCache
+import cProfile
+import copy
 import math
+import time
+
+# Solver attributes that make up a configuration: everything Sweep, MonteCarlo and Screening copy from a baseline.
+attributes = ("airPressure", "airVolume", "waterVolume", "structuralMass", "payloadMass", "frontalArea",
+              "tankThickness", "tankRadius", "d_noz", "dragScale", "dt", "integrator", "engine", "atmosphere",
+              "dragPath")
 
 
 class Solver:
@@ -35,56 +50,190 @@ class Solver:
     tankThickness = 00.1  # m
     tankRadius = 0.1  # m
     d_noz = 0.01  # m
-    rocket = Rocket.Rocket()
+    dragScale = 1.0  # Multiplier on the drag coefficients from drag.csv
+    integrator = "fixed"  # or "rk45" for adaptive steps, with the "coupled" or "analytic" engine only: the "profile"
+    # curve lags the tank by one dt, which rk45 interpolates faithfully rather than converging past it (see simulate).
+    engine = "profile"  # or "coupled" to step the tank with the flight instead of running a thrust profile first, or
+    # "analytic" for the closed form thrust profile (requires numpy)
+    dt = 0.01  # s, time step of the thrust profile and the flight
+    dragPath = "drag.csv"
+    outputPath = "_out.csv"
+    profilePath = "_thrust_profile.csv"
+    profileCache = ThrustProfileCache.default  # None to always run the thrust profile
+    instrumentation = None  # Instrumentation for the current run, see calculate
+    structures = Structures.TankStress()  # Allowable stress and safety factor, see getStresses and calculateBatch
+    atmosphere = None  # Atmosphere for density, speed of sound and ambient pressure, or None for the old constants
+    rocket = None
 
     # Class Methods
     @staticmethod
-    def importDragData():
-        """ Returns a list of drag tuples from the given drag csv. """
-        drag = []
-        dragfile = open("drag.csv", "r")
-        dragstr = dragfile.read()
-        for line in dragstr.splitlines():
-            point = line.split(',')[0], line.split(',')[1], line.split(',')[2]
-            drag.append(point)
-        return drag
+    def importDragData(path="drag.csv"):
+        """ Returns the drag table for the drag csv. The file is only parsed again if it has changed. """
+        return DragTable.DragTable.load(path)
 
     @staticmethod
-    def writeOut(data):
-        """ Writes the given list of points to a file named 'out.csv'. """
-        _file = open("_out.csv", "w")
-        _file.write("Time (s),X (m),Y (m),Velocity (m/s),Acceleration (g),Mass (kg),Thrust (N),Drag (custom),Comment\n")
-        _file.write(
-            str(data[-1].time) + "," + str(data[-1].x) + "," + str(data[-1].y) + ",," + str(
-                data[-1].acceleration / 9.81) + "," + str(data[-1].mass) + ",,,Max Height\n-,-,-,-,-\n")
+    def writeOut(data, path="_out.csv"):
+        """ Writes the given list of points to a csv file, by default '_out.csv', replacing it whole (see
+        Sinks.writeFile). Returns the number of bytes written. """
+        lines = ["Time (s),X (m),Y (m),Velocity (m/s),Acceleration (g),Mass (kg),Thrust (N),Drag (custom),Comment\n",
+                 str(data[-1].time) + "," + str(data[-1].x) + "," + str(data[-1].y) + ",," + str(
+                     data[-1].acceleration / 9.81) + "," + str(data[-1].mass) + ",,,Max Height\n-,-,-,-,-\n"]
         for point in data:
-            _file.write(
+            lines.append(
                 str(point.time) + "," + str(point.x) + "," + str(point.y) + "," + str(point.velocity) + "," + str(
                     point.acceleration / 9.81) + "," + str(point.mass) + "," + str(point.thrust) + "," + str(
                     point.drag) + "," + point.comment + "\n")
-        _file.close()
+        return Sinks.writeFile(path, "".join(lines))
 
     # Instance Methods
     def __init__(self):
-        pass
+        self.rocket = Rocket.Rocket()
+
+    def simulate(self, write=False, record=True, sinks=()):
+        """ Flies the rocket and returns the apogee height.
+        :param write: bool Whether the thrust profile is written to file and console. The coupled engine has no
+        thrust profile to write.
+        :param record: bool Whether the rocket keeps every point of the trajectory.
+        :param sinks: list Sinks (see Sinks.py) that are handed every point as it is calculated.
+        :rtype : float Apogee height (m)
+        """
+        self.__checkIntegrator()
+        stats = self.instrumentation
+        self.__buildRocket(record)
+        start = time.time()
+        if write and self.engine != "coupled":
+            thrustProfile = self.__makeThrustProfile()
+            self.rocket.flightStats = thrustProfile.getThrustProfile(self.airPressure, self.airVolume,
+                                                                     self.waterVolume, self.d_noz, False)
+            self.rocket.thrustCurve = ThrustCurve.ThrustCurve(self.rocket.flightStats)
+            if stats is not None:
+                stats.addTime("thrust profile", time.time() - start)
+            start = time.time()
+            thrustProfile.output()
+            if stats is not None:
+                stats.fileWritten(thrustProfile.bytesWritten, time.time() - start)
+        else:
+            self.__loadPropulsion()
+            if stats is not None:
+                stats.addTime("thrust profile", time.time() - start)
+        # Start Calculations
+        self.rocket.calcLength()
+        self.__peakStresses()
+        self.rocket.launch(sinks)
+        return self.getMaxHeight()
 
-    def calculate(self):
-        """ Main """
+    def __checkIntegrator(self):
+        """ Raises ValueError for rk45 with the "profile" engine. For main.py that flies to 582 m, against 555 m with
+        fixed steps and about 500 m converged. A coast with rk45 is fine, having no thrust curve to follow. """
+        if self.integrator == "rk45" and self.engine == "profile":
+            raise ValueError('The rk45 integrator needs the "coupled" or "analytic" engine, not "profile"')
+
+    def __buildRocket(self, record):
+        """ Replaces the rocket with a new one set up from this solver, without a thrust curve. """
         self.rocket = Rocket.Rocket()
-        self.rocket.drag = self.importDragData()
-        thrustProfile = ThrustProfile.ThrustProfile()
-        self.rocket.flightStats = thrustProfile.getThrustProfile(self.airPressure, self.airVolume, self.waterVolume,
-                                                                 self.d_noz)
+        self.rocket.instrumentation = self.instrumentation
+        self.rocket.drag = self.importDragData(self.dragPath)
         # Set values.
         self.rocket.payloadMass = self.payloadMass
         self.rocket.structuralMass = self.structuralMass
         self.rocket.frontalArea = self.frontalArea
+        self.rocket.dragScale = self.dragScale
         self.rocket.tankRadius = self.tankRadius
         self.rocket.tankThickness = self.tankThickness
-        # Start Calculations
-        self.rocket.calcLength()
+        self.rocket.integrator = self.integrator
+        self.rocket.dt = self.dt
+        self.rocket.record = record
+        self.rocket.atmosphere = self.atmosphere
+        self.rocket.engine = self.engine
+
+    def ambientPressure(self):
+        """ Returns the pressure the nozzle exhausts into (Pa): the launch site pressure if there is an atmosphere,
+        otherwise ThrustProfile's default. """
+        if self.atmosphere is None:
+            return ThrustProfile.ThrustProfile.p_atmosphere
+        return self.atmosphere.pressureAt(0.0)
+
+    def __makeThrustProfile(self):
+        if self.engine == "analytic":
+            import AnalyticProfile  # Only the analytic engine needs numpy.
+            thrustProfile = AnalyticProfile.AnalyticProfile()
+        else:
+            thrustProfile = ThrustProfile.ThrustProfile()
+        thrustProfile.outputPath = self.profilePath
+        thrustProfile.dt = self.dt
+        thrustProfile.p_atmosphere = self.ambientPressure()
+        return thrustProfile
+
+    def __loadPropulsion(self):
+        """ Gives the rocket its tank for the coupled engine, otherwise its thrust curve (cached if possible). """
+        if self.engine == "coupled":
+            self.rocket.tank = Tank.Tank(self.airPressure, self.airVolume, self.waterVolume, self.d_noz,
+                                         self.ambientPressure())
+        elif self.profileCache is None or self.engine == "analytic":
+            self.rocket.thrustCurve = ThrustCurve.ThrustCurve(self.__makeThrustProfile().getThrustProfile(
+                self.airPressure, self.airVolume, self.waterVolume, self.d_noz, False))
+        else:
+            self.rocket.thrustCurve = self.profileCache.getThrustCurve(
+                self.airPressure, self.airVolume, self.waterVolume, self.d_noz, self.dt, self.ambientPressure())
+
+    def burnoutState(self):
+        """ Flies only the powered part of the flight and returns the state once the thrust has ended. Any number
+        of coast phase variants can then be resumed from it with coast().
+        :rtype : FlightState
+        """
+        self.__checkIntegrator()
+        self.__buildRocket(False)
+        self.__loadPropulsion()
+        return self.rocket.launchToBurnout()
+
+    def coast(self, state, record=False, sinks=()):
+        """ Finishes a flight from a burnout state with this solver's coast phase inputs (drag table, dragScale,
+        masses, frontal area, integrator and dt). No files are written.
+        :param state: FlightState From burnoutState().
+        :param record: bool Whether the rocket keeps the points of the coast.
+        :rtype : FlightSummary Covering the whole flight, including the powered part.
+        """
+        self.__buildRocket(record)
+        self.rocket.resume(state)
+        self.rocket.launch(sinks)
+        return self.rocket.summary
+
+    def coastVariants(self, state, variants):
+        """ Resumes each variant from the same burnout state.
+        :param state: FlightState From burnoutState().
+        :param variants: list Dicts of Solver attributes to change for each coast, e.g. {"dragScale": 1.1}.
+        :rtype : list FlightSummary for each variant.
+        """
+        summaries = []
+        for variant in variants:
+            solver = copy.copy(self)
+            for name, value in variant.items():
+                setattr(solver, name, value)
+            summaries.append(solver.coast(state))
+        return summaries
+
+    def calculate(self, instrument=False, profile=None):
+        """ Main
+        :param instrument: bool Collect phase timings, step and lookup counts and file output stats.
+        :param profile: str Path to dump cProfile stats for the run to, readable with pstats.
+        :rtype : Instrumentation The collected stats, or None if instrument is off.
+        """
+        self.instrumentation = Instrumentation.Instrumentation() if instrument else None
+        profiler = None
+        if profile is not None:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            self.__calculate()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profile)
+        return self.instrumentation
+
+    def __calculate(self):
+        self.simulate(True)
         self.getStresses()
-        self.rocket.launch()
         # Output
         points = self.rocket.getAllPoints()
         print "\nDry Mass: {0}(kg) or {1}(lb)".format(self.structuralMass + self.payloadMass, (self.structuralMass +
@@ -100,20 +249,71 @@ class Solver:
                 3.14) * 100))
         print "Hoop Stress: {0}(MPa) Longitudinal Stress: {1}(MPa)".format(str(self.rocket.hoopStressCurrent / 1000000),
                                                                            str(self.rocket.longStressCurrent / 1000000))
-        self.writeOut(points)
+        start = time.time()
+        byteCount = self.writeOut(points, self.outputPath)
+        if self.instrumentation is not None:
+            self.instrumentation.fileWritten(byteCount, time.time() - start)
+
+    def calculateBatch(self, configs, screen=False):
+        """ Flies many configurations in one vectorized pass. Requires numpy.
+        The batch replays the fixed step profile model, which the fixed step "coupled" engine matches exactly, so it
+        needs integrator "fixed" and engine "profile" or "coupled"; any other solver raises ValueError rather than
+        returning results for a model it did not fly.
+        :param configs: dict Arrays of values keyed by Solver attribute name (airPressure, airVolume, waterVolume,
+        d_noz, structuralMass, payloadMass, frontalArea, dragScale, tankRadius, tankThickness). Missing attributes use
+        this solver's value.
+        :param screen: bool Check every tank against self.structures first and only fly the ones that hold. The
+        results of the others are nan.
+        :rtype : BatchEngine.BatchResult Apogee, burnout time and max acceleration for each configuration.
+        """
+        if self.integrator != "fixed" or self.engine not in ("profile", "coupled"):
+            raise ValueError("calculateBatch only flies the fixed step profile model, not integrator {0!r} with engine "
+                             "{1!r}".format(self.integrator, self.engine))
+        import BatchEngine  # Only batch runs need numpy.
+        engine = BatchEngine.BatchEngine(self.importDragData(self.dragPath), self.dt, self.atmosphere)
+        values = engine.prepare(self, configs)
+        if not screen:
+            return engine.simulate(values)
+        feasible = self.structures.feasibleConfiguration(values)
+        result = engine.simulate(dict((name, value[feasible]) for name, value in values.items()))
+        return result.scatter(feasible)
+
+    def apogee(self):
+        """ Flies the rocket keeping only the running extrema and events: no trajectory, files or printing.
+        :rtype : FlightSummary
+        """
+        self.simulate(False, False)
+        return self.rocket.summary
 
     def getMaxHeight(self):
         points = self.rocket.getAllPoints()
         if len(points) > 0:
             maxPoint = points[-1]
             return maxPoint.y
+        if self.rocket.hasReachedApogee:
+            return self.rocket.summary.apogee
+
+    def __peakStresses(self):
+        """ Sets the rocket's current stresses to the peak, at the fill pressure. Every flight pays for this. """
+        self.rocket.hoopStressCurrent = self.structures.hoopStress(self.airPressure, self.tankRadius,
+                                                                   self.tankThickness)
+        self.rocket.longStressCurrent = self.structures.longStress(self.airPressure, self.tankRadius,
+                                                                   self.tankThickness)
 
     def getStresses(self):
-        """ Calculates the stresses and forces on the rocket body. Accounts for both internal pressure loads and
-        external drag forces. """
+        """ Calculates the stresses and forces on the rocket body after a flight. Accounts for both internal pressure
+        loads and external drag forces. The current stresses are the peak, at the fill pressure; the rocket's
+        hoopStress and longStress arrays follow the tank pressure through the burn. Only calculate() builds them, so
+        call this after simulate() to get them otherwise. The coupled engine's pressures are recorded by the flight,
+        so it must have been flown with record on. """
         # self.flightStats: {Time, Thrust, MassFlow, Current Mass, Current Air Volume, Current Water Volume, Total
                             # Air Volume, Total Water Volume, Current Air Mass, Current Water Mass}
         # Get the current tank status.
-        self.rocket.hoopStressCurrent = self.airPressure * self.tankRadius / self.tankThickness
-        self.rocket.longStressCurrent = self.airPressure * self.tankRadius / (2 * self.tankThickness)
+        self.__peakStresses()
+        if self.rocket.tank is not None:
+            pressures = self.rocket.tankPressure
+        else:
+            pressures = self.rocket.thrustCurve.pressure
+        self.rocket.hoopStress, self.rocket.longStress = self.structures.history(pressures, self.tankRadius,
+                                                                                 self.tankThickness)
         return 0
\ No newline at end of file
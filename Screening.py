@@ -0,0 +1,102 @@
+##
+#   Screening.py
+#
+#   Design screening: every candidate is flown once, in a single batch where numpy is available, and ranked.
+##
+
+import RocketTrajectoryCalculator
+import Sweep
+
+
+class Candidate:
+    """ One configuration and its apogee. """
+
+    def __init__(self, config):
+        self.config = config
+        self.apogee = None  # m
+
+
+class ScreeningResult:
+    """ Outcome of a screening run. """
+
+    def __init__(self, candidates, threshold, cost, batchCost=0.0):
+        """
+        :param candidates: list Candidate for every configuration, in the order given.
+        :param threshold: float Target apogee, or None.
+        :param cost: float Scalar flights spent.
+        :param batchCost: float Flights spent in Solver.calculateBatch. Each costs far less than a scalar flight, so
+        the two are kept apart.
+        """
+        self.candidates = candidates
+        self.threshold = threshold
+        self.cost = cost
+        self.batchCost = batchCost
+        self.ranked = sorted(candidates, key=lambda candidate: candidate.apogee, reverse=True)
+        self.best = self.ranked[0].config if self.ranked else None
+        self.apogee = self.ranked[0].apogee if self.ranked else None
+
+    def top(self, count):
+        """ Returns the configurations with the count highest apogees, highest first. """
+        return [candidate.config for candidate in self.ranked[:count]]
+
+    def exceeding(self):
+        """ Returns the configurations whose apogee is above the threshold. """
+        return [candidate.config for candidate in self.candidates if candidate.apogee > self.threshold]
+
+
+class Screening:
+    """ Ranks candidates by apogee and classifies them against a threshold.
+
+    With numpy every candidate is flown in one Solver.calculateBatch call, which matches the scalar fixed step
+    solver exactly at a small fraction of the cost, so there is nothing left to refine. Candidates may then only
+    differ in BatchEngine.parameters, and the solver must be one calculateBatch accepts. Without numpy (or with
+    vectorized off) it is a plain Sweep over the worker pool.
+
+    A cheap coarse triage does not pay here: the fixed step apogee at a coarse step is off by hundreds of meters and
+    jumps between neighbouring designs, and the smooth coupled rk45 path already costs less than a fixed step flight
+    at 0.01 s. """
+
+    def __init__(self, solver=None, processes=None, vectorized=None):
+        """
+        :param solver: Solver Baseline for any attribute a candidate does not set.
+        :param processes: int Worker processes for the scalar flights. Defaults to the number of CPUs.
+        :param vectorized: bool Fly the candidates in one batch. Defaults to whether numpy is installed.
+        """
+        self.solver = solver or RocketTrajectoryCalculator.Solver()
+        self.sweep = Sweep.Sweep(self.solver, processes=processes)
+        self.processes = self.sweep.processes
+        if vectorized is None:
+            try:
+                import numpy
+                vectorized = True
+            except ImportError:
+                vectorized = False
+        self.vectorized = vectorized
+
+    def run(self, configs, threshold=None):
+        """ Screens the configurations.
+        :param configs: list Dicts of Solver attribute values, e.g. from Sweep.grid.
+        :param threshold: float Target apogee (m) to classify the candidates against, or None.
+        :rtype : ScreeningResult
+        """
+        candidates = [Candidate(self.sweep.configuration(config)) for config in configs]
+        if not candidates:
+            return ScreeningResult(candidates, threshold, 0.0)
+        configs = [candidate.config for candidate in candidates]
+        if self.vectorized:
+            import BatchEngine  # Only the vectorized path needs numpy.
+            solver = self.solver
+            for config in configs:
+                for name in RocketTrajectoryCalculator.attributes:
+                    if name not in BatchEngine.BatchEngine.parameters and config[name] != getattr(solver, name):
+                        raise ValueError("Batched candidates may only differ in BatchEngine.parameters, not "
+                                         "{0}".format(name))
+            batch = dict((name, [config[name] for config in configs]) for name in BatchEngine.BatchEngine.parameters)
+            apogees = [float(apogee) for apogee in solver.calculateBatch(batch).apogee]
+            cost, batchCost = 0.0, float(len(configs))
+        else:
+            apogees = [apogee for config, apogee in Sweep.evaluateAll(configs, self.processes)]
+            cost, batchCost = float(len(configs)), 0.0
+        for candidate, apogee in zip(candidates, apogees):
+            candidate.apogee = apogee
+        return ScreeningResult(candidates, threshold, cost, batchCost)
@@ -0,0 +1,168 @@
+##
+#   Sensitivity.py
+#
+#   Partial derivatives of the apogee with respect to the design parameters, from batch runs.
+#   Requires numpy.
+##
+
+import copy
+
+import numpy
+
+import BatchEngine
+
+
+class SensitivityResult:
+    """ Apogee and its partial derivatives at one design. """
+
+    def __init__(self, values, apogee, derivatives, steps=None, unresolved=()):
+        """
+        :param values: dict Parameter values of the design.
+        :param apogee: float m
+        :param derivatives: dict d(apogee)/d(parameter) (m per unit of the parameter), keyed by name.
+        :param steps: dict Perturbation each derivative was finally taken with, keyed by name.
+        :param unresolved: list Names whose forward and backward differences still disagreed at the widest step.
+        Their derivatives are unreliable.
+        """
+        self.values = values
+        self.apogee = apogee
+        self.derivatives = derivatives
+        self.steps = steps or {}
+        self.unresolved = set(unresolved)
+        # Elasticity: the percent change in apogee for a one percent change in the parameter.
+        self.elasticities = dict((name, derivative * values[name] / apogee if apogee else 0.0)
+                                 for name, derivative in derivatives.items())
+
+    def ranking(self):
+        """ Returns (name, elasticity) pairs, most influential parameter first. """
+        return sorted(self.elasticities.items(), key=lambda item: abs(item[1]), reverse=True)
+
+
+class Sensitivity:
+    """ Central differences of the apogee for every parameter at once: the design and the two perturbed copies for
+    each parameter are flown together in one Solver.calculateBatch call, so N parameters cost one batch of 2N + 1
+    flights rather than 2N separate runs. Several designs can share the batch too.
+
+    The fixed step apogee is a sawtooth in the parameters: it jumps whenever burnout moves across a time step, by
+    tens of meters at dt = 0.01, which can flip the sign of a difference over a percent. So the batch is flown at a
+    fine time step, and each derivative is checked by comparing the forward and backward differences. Where they
+    disagree the step is doubled and that parameter flown again, up to a limit, after which the parameter is marked
+    unresolved in the result. reference() gives derivatives from separate runs on the smooth coupled rk45 path to
+    check against. """
+    # Default parameters to differentiate.
+    parameters = ("airPressure", "airVolume", "waterVolume", "d_noz", "structuralMass", "payloadMass", "frontalArea",
+                  "dragScale")
+
+    def __init__(self, solver, parameters=parameters, relativeStep=0.01, minimumStep=1e-6, dt=0.001, tolerance=0.25,
+                 widenings=4):
+        """
+        :param solver: Solver Baseline for every parameter that is not given.
+        :param parameters: list Names to differentiate with respect to. Must be in BatchEngine.parameters.
+        :param relativeStep: float First perturbation as a fraction of each value.
+        :param minimumStep: float First perturbation for values at or near zero.
+        :param dt: float Time step for the batch, or None for the solver's.
+        :param tolerance: float Largest relative difference between the forward and backward differences that is
+        accepted.
+        :param widenings: int Times the step may be doubled for a parameter before it is marked unresolved.
+        """
+        self.solver = solver
+        self.parameters = tuple(parameters)
+        for name in self.parameters:
+            if name not in BatchEngine.BatchEngine.parameters:
+                raise ValueError("{0} is not a batch parameter".format(name))
+        self.relativeStep = relativeStep
+        self.minimumStep = minimumStep
+        self.dt = dt
+        self.tolerance = tolerance
+        self.widenings = widenings
+
+    def __design(self, values):
+        design = dict((name, float(getattr(self.solver, name))) for name in self.parameters)
+        design.update(values or {})
+        return design
+
+    def __fly(self, rows):
+        """ Returns the apogees for a list of designs, flown in one batch. """
+        solver = copy.copy(self.solver)
+        if self.dt is not None:
+            solver.dt = self.dt
+        batch = dict((name, numpy.array([row[name] for row in rows], dtype=float)) for name in self.parameters)
+        return solver.calculateBatch(batch).apogee
+
+    def __disagree(self, forward, backward):
+        return abs(forward - backward) > self.tolerance * max(abs(forward), abs(backward))
+
+    def analyze(self, designs):
+        """ Differentiates several designs, in one batch plus one more for each widening any parameter needs.
+        :param designs: list Dicts of parameter values; missing parameters use the solver's.
+        :rtype : list SensitivityResult for each design.
+        """
+        designs = [self.__design(values) for values in designs]
+        steps = [dict((name, max(abs(design[name]) * self.relativeStep, self.minimumStep))
+                      for name in self.parameters) for design in designs]
+        derivatives = [{} for design in designs]
+        unresolved = [[] for design in designs]
+        centres = None
+        pending = [(d, name) for d in range(len(designs)) for name in self.parameters]
+        widening = 0
+        while pending:
+            rows = [] if centres is not None else list(designs)
+            for d, name in pending:
+                for sign in (1, -1):
+                    row = dict(designs[d])
+                    row[name] += sign * steps[d][name]
+                    rows.append(row)
+            apogees = self.__fly(rows)
+            if centres is None:
+                centres, apogees = apogees[:len(designs)], apogees[len(designs):]
+            retry = []
+            for i, (d, name) in enumerate(pending):
+                up, down, step = apogees[2 * i], apogees[2 * i + 1], steps[d][name]
+                derivatives[d][name] = float((up - down) / (2 * step))
+                if self.__disagree((up - centres[d]) / step, (centres[d] - down) / step):
+                    if widening < self.widenings:
+                        steps[d][name] = 2 * step
+                        retry.append((d, name))
+                    else:
+                        unresolved[d].append(name)
+            pending = retry
+            widening += 1
+        return [SensitivityResult(design, float(centres[d]), derivatives[d], steps[d], unresolved[d])
+                for d, design in enumerate(designs)]
+
+    def gradient(self, values=None):
+        """ Differentiates one design, by default the solver's.
+        :rtype : SensitivityResult
+        """
+        return self.analyze([values])[0]
+
+    def reference(self, values=None):
+        """ Differentiates one design by central differences of separate coupled rk45 flights, whose apogee is smooth
+        in the parameters, to check gradient() against. Costs 2N + 1 scalar flights.
+        :rtype : SensitivityResult
+        """
+        design = self.__design(values)
+
+        def fly(changes):
+            solver = copy.copy(self.solver)
+            solver.engine = "coupled"
+            solver.integrator = "rk45"
+            for name, value in design.items():
+                setattr(solver, name, value)
+            for name, value in changes.items():
+                setattr(solver, name, value)
+            return solver.apogee().apogee
+
+        derivatives = {}
+        steps = {}
+        for name in self.parameters:
+            step = max(abs(design[name]) * self.relativeStep, self.minimumStep)
+            derivatives[name] = (fly({name: design[name] + step}) - fly({name: design[name] - step})) / (2 * step)
+            steps[name] = step
+        return SensitivityResult(design, fly({}), derivatives, steps)
+
+    def objective(self, point):
+        """ Returns (apogee, gradient) as a float and a numpy array for a point given in the order of parameters, for
+        gradient based optimizers. """
+        result = self.gradient(dict(zip(self.parameters, point)))
+        return result.apogee, numpy.array([result.derivatives[name] for name in self.parameters])
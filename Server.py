@@ -0,0 +1,245 @@
+##
+#   Server.py
+#
+#   Long running simulation server. Reads Solver configurations as JSON lines and streams back a summary for each.
+#
+#   python Server.py                     Serve stdin/stdout
+#   python Server.py --socket PATH       Serve connections on a Unix socket
+#
+#   Each request is one line: {"id": 1, "solver": {"airPressure": 7584233.0, "integrator": "rk45", ...}}
+#   Any configuration attribute of the Solver (see settable) may be set, and is checked before anything is flown:
+#   numbers must be finite, and sizes, pressures and the time step positive. "atmosphere" takes the Atmosphere
+#   constructor's arguments as an object, e.g. {"elevation": 1500}. A "batch" object of equal length lists of
+#   BatchEngine parameters (see Solver.calculateBatch) flies them all at once, with "screen": true to skip tanks that
+#   fail the structural check.
+#   Each response is one line with the same id, in the order the requests finish: the FlightSummary values, lists of
+#   BatchResult values for a batch, or {"id": ..., "error": "..."}. Nothing is written to disk.
+##
+
+import argparse
+import json
+import math
+import multiprocessing
+import numbers
+import os
+import signal
+import sys
+
+try:
+    import socketserver
+except ImportError:  # Python 2
+    import SocketServer as socketserver
+
+import Atmosphere
+import DragTable
+import RocketTrajectoryCalculator
+
+summaryFields = ("apogee", "apogeeTime", "burnoutTime", "burnoutVelocity", "burnoutHeight", "maxVelocity",
+                 "maxAcceleration", "steps")
+batchFields = ("apogee", "burnoutTime", "burnoutVelocity", "burnoutHeight", "maxVelocity", "maxAcceleration",
+               "flightTime", "steps")
+
+# Solver attributes a request may set. The drag table is the server's own (--drag).
+settable = tuple(name for name in RocketTrajectoryCalculator.attributes if name != "dragPath")
+choices = {"integrator": ("fixed", "rk45"), "engine": ("profile", "coupled", "analytic")}
+# Zero or negative values here make no physical sense, and a zero time step never finishes.
+positive = ("airPressure", "airVolume", "waterVolume", "d_noz", "frontalArea", "tankRadius", "tankThickness", "dt")
+minimumDt = 1e-5  # s, smaller steps take too long to answer
+atmosphereArguments = ("elevation", "step", "ceiling", "temperatureOffset")
+maximumAtmosphereRows = 100000
+
+# Per process state, set up once by initialize.
+dragPath = "drag.csv"
+atmospheres = {}  # {sorted Atmosphere arguments: Atmosphere}
+
+
+def initialize(path):
+    """ Loads the drag table once per worker so requests only pay for the flight. """
+    global dragPath
+    dragPath = path
+    DragTable.DragTable.load(path)
+
+
+def atmosphere(arguments):
+    """ Returns the Atmosphere for the given constructor arguments, building each table only once per process. """
+    key = tuple(sorted(arguments.items()))
+    table = atmospheres.get(key)
+    if table is None:
+        table = Atmosphere.Atmosphere(**arguments)
+        atmospheres[key] = table
+    return table
+
+
+def number(name, value):
+    """ Returns value if it is a finite number acceptable for the named attribute, else raises ValueError. """
+    if isinstance(value, bool) or not isinstance(value, numbers.Real) or math.isinf(value) or math.isnan(value):
+        raise ValueError("{0} must be a finite number, not {1!r}".format(name, value))
+    if name in positive and not value > 0:
+        raise ValueError("{0} must be positive, not {1!r}".format(name, value))
+    if name in ("structuralMass", "payloadMass", "dragScale") and value < 0:
+        raise ValueError("{0} must not be negative, not {1!r}".format(name, value))
+    if name == "dt" and value < minimumDt:
+        raise ValueError("dt must be at least {0}, not {1!r}".format(minimumDt, value))
+    return value
+
+
+def checkAtmosphere(arguments):
+    """ Returns the Atmosphere constructor arguments if they are valid, else raises ValueError. """
+    if not isinstance(arguments, dict):
+        raise ValueError("atmosphere must be an object of Atmosphere arguments, not {0!r}".format(arguments))
+    for name, value in arguments.items():
+        if name not in atmosphereArguments:
+            raise ValueError("Unknown atmosphere argument: {0}".format(name))
+        number(name, value)
+    step = arguments.get("step", 1.0)
+    ceiling = arguments.get("ceiling", 1.0)
+    if not step > 0 or not ceiling > 0 or ceiling / float(step) > maximumAtmosphereRows:
+        raise ValueError("atmosphere step and ceiling must be positive, with at most {0} rows".format(
+            maximumAtmosphereRows))
+    return arguments
+
+
+def configure(solver, settings):
+    """ Checks every requested setting and applies it to the solver. """
+    if not isinstance(settings, dict):
+        raise ValueError("solver must be an object, not {0!r}".format(settings))
+    for name, value in settings.items():
+        if name not in settable:
+            raise ValueError("Unknown solver attribute: {0}".format(name))
+        if name in choices:
+            if value not in choices[name]:
+                raise ValueError("{0} must be one of {1}, not {2!r}".format(name, ", ".join(choices[name]), value))
+        elif name == "atmosphere":
+            if value is not None:
+                value = atmosphere(checkAtmosphere(value))
+        else:
+            number(name, value)
+        setattr(solver, name, value)
+
+
+def checkBatch(batch):
+    """ Returns the batch if every entry is a BatchEngine parameter given as a number or list of valid numbers. """
+    import BatchEngine  # Only batch requests need numpy.
+    if not isinstance(batch, dict):
+        raise ValueError("batch must be an object of lists, not {0!r}".format(batch))
+    for name, values in batch.items():
+        if name not in BatchEngine.BatchEngine.parameters:
+            raise ValueError("Unknown batch parameter: {0}".format(name))
+        for value in values if isinstance(values, list) else [values]:
+            number(name, value)
+    return batch
+
+
+def evaluate(request):
+    """ Checks and flies one decoded request and returns the response dict. """
+    solver = RocketTrajectoryCalculator.Solver()
+    solver.dragPath = dragPath
+    configure(solver, request.get("solver", {}))
+    if "batch" in request:
+        result = solver.calculateBatch(checkBatch(request["batch"]), bool(request.get("screen", False)))
+        response = dict((name, [float(value) for value in getattr(result, name)]) for name in batchFields)
+        if result.feasible is not None:
+            response["feasible"] = [bool(value) for value in result.feasible]
+    else:
+        summary = solver.apogee()
+        response = dict((name, getattr(summary, name)) for name in summaryFields)
+    response["id"] = request.get("id")
+    return response
+
+
+def handle(line):
+    """ Answers one request line with a response line, or returns None for a blank line. Runs in the workers. """
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+    if not line.strip():
+        return None
+    requestId = None
+    try:
+        request = json.loads(line)
+        requestId = request.get("id")
+        response = evaluate(request)
+    except Exception as error:
+        response = {"id": requestId, "error": "{0}: {1}".format(type(error).__name__, error)}
+    return json.dumps(response, sort_keys=True) + "\n"
+
+
+class Server:
+    """ Hands request lines to a pool of worker processes and streams the responses back as they finish. """
+
+    def __init__(self, processes=None, dragPath="drag.csv"):
+        """
+        :param processes: int Worker processes. Defaults to the number of CPUs; 1 answers in process.
+        :param dragPath: str Drag csv loaded by every worker.
+        """
+        self.processes = processes or multiprocessing.cpu_count()
+        self.dragPath = dragPath
+        self.pool = None
+        if self.processes > 1:
+            self.pool = multiprocessing.Pool(self.processes, initialize, (dragPath,))
+        else:
+            initialize(dragPath)
+
+    def responses(self, lines):
+        """ Yields a response line for every request line, in the order they finish. """
+        if self.pool is None:
+            results = (handle(line) for line in lines)
+        else:
+            results = self.pool.imap_unordered(handle, lines)
+        for response in results:
+            if response is not None:
+                yield response
+
+    def serve(self, inputFile, outputFile, encode=False):
+        """ Answers every line of inputFile until it ends. """
+        for response in self.responses(iter(inputFile.readline, b"" if encode else "")):
+            outputFile.write(response.encode("utf-8") if encode else response)
+            outputFile.flush()
+
+    def serveSocket(self, path):
+        """ Accepts connections on a Unix socket until interrupted. Each connection is served on its own thread and
+        all of them share the worker pool. """
+        if os.path.exists(path):
+            os.remove(path)
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server.serve(self.rfile, self.wfile, True)
+
+        listener = socketserver.ThreadingUnixStreamServer(path, Handler)
+        listener.daemon_threads = True
+        try:
+            listener.serve_forever()
+        finally:
+            listener.server_close()
+            os.remove(path)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Solver configurations given as JSON lines.")
+    parser.add_argument("--socket", help="listen on this Unix socket instead of stdin/stdout")
+    parser.add_argument("--processes", type=int, help="worker processes, defaults to the number of CPUs")
+    parser.add_argument("--drag", default="drag.csv", help="drag coefficient csv")
+    arguments = parser.parse_args()
+
+    server = Server(arguments.processes, os.path.abspath(arguments.drag))
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # Clean up the socket when stopped.
+    try:
+        if arguments.socket:
+            server.serveSocket(arguments.socket)
+        else:
+            server.serve(sys.stdin, sys.stdout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+##
+#   Sinks.py
+#
+#   Incremental writers for a flight, fed one point at a time by Rocket.launch.
+##
+
+import os
+import struct
+import threading
+from array import array
+
+
+def temporaryPath(path, owner):
+    """ Returns a temporary file name next to path that no other process, thread or owner object uses. """
+    return "{0}.{1}.{2}.{3}.tmp".format(path, os.getpid(), threading.current_thread().ident, id(owner))
+
+
+def replace(temporary, path):
+    """ Moves a finished temporary file into place over path. """
+    if os.name == "nt" and os.path.exists(path):
+        os.remove(path)
+    os.rename(temporary, path)
+
+
+def writeFile(path, text):
+    """ Writes a whole text file the way the sinks do: to a temporary file that is renamed into place, or deleted if
+    writing fails. Returns the number of characters written. """
+    temporary = temporaryPath(path, text)
+    _file = open(temporary, "w")
+    try:
+        _file.write(text)
+        _file.close()
+    except Exception:
+        _file.close()
+        os.remove(temporary)
+        raise
+    replace(temporary, path)
+    return len(text)
+
+
+class Sink:
+    """ Base class for writers. Points are buffered and written batchSize at a time to a temporary file next to the
+    destination, which is renamed into place on close, so readers never see a half written file and runs writing the
+    same path replace the file whole instead of interleaving. Each sink has its own temporary file, even across
+    threads. If a sink used as a context manager exits with an exception, its file is thrown away. """
+
+    def __init__(self, path, batchSize=1000):
+        self.path = path
+        self.batchSize = batchSize
+        self.count = 0  # Points written
+        self.bytesWritten = 0
+        self.__temporaryPath = temporaryPath(path, self)
+        self._file = open(self.__temporaryPath, "wb")
+        self._buffered = 0
+
+    def write(self, point):
+        """ Adds a point to the output. """
+        self._buffer(point)
+        self.count += 1
+        self._buffered += 1
+        if self._buffered >= self.batchSize:
+            self.flush()
+
+    def flush(self):
+        """ Writes any buffered points to the file. """
+        data = self._drain()
+        if data:
+            self._file.write(data)
+            self.bytesWritten += len(data)
+        self._buffered = 0
+
+    def close(self):
+        """ Writes what is left and moves the file into place. """
+        if self._file is None:
+            return
+        self.flush()
+        self._finish()
+        self._file.close()
+        self._file = None
+        replace(self.__temporaryPath, self.path)
+
+    def discard(self):
+        """ Closes and deletes the temporary file, leaving the destination as it was. """
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        os.remove(self.__temporaryPath)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exception, traceback):
+        if exceptionType is None:
+            self.close()
+        else:
+            self.discard()
+
+    # Subclass hooks
+    def _buffer(self, point):
+        raise NotImplementedError
+
+    def _drain(self):
+        """ Returns the buffered points as bytes and clears the buffer. """
+        raise NotImplementedError
+
+    def _finish(self):
+        """ Called before the file is closed. """
+
+
+class CsvSink(Sink):
+    """ Writes points as csv rows with the same columns as Solver.writeOut. """
+    header = "Time (s),X (m),Y (m),Velocity (m/s),Acceleration (g),Mass (kg),Thrust (N),Drag (custom),Comment\n"
+
+    def __init__(self, path, batchSize=1000):
+        Sink.__init__(self, path, batchSize)
+        self.__rows = [self.header]
+
+    def _buffer(self, point):
+        self.__rows.append("{0},{1},{2},{3},{4},{5},{6},{7},{8}\n".format(
+            str(point.time), str(point.x), str(point.y), str(point.velocity), str(point.acceleration / 9.81),
+            str(point.mass), str(point.thrust), str(point.drag), point.comment))
+
+    def _drain(self):
+        data = "".join(self.__rows).encode("latin-1")
+        self.__rows = []
+        return data
+
+
+class NpySink(Sink):
+    """ Writes points as a float64 NumPy .npy file of shape (points, len(fields)), which numpy.load can memory map.
+    Comments are not stored. numpy itself is not needed to write the file. """
+    fields = ("time", "x", "y", "velocity", "acceleration", "drag", "thrust", "mach", "mass")
+    # Wide enough for any row count, so the header can be rewritten in place once the length is known.
+    __countWidth = 20
+
+    def __init__(self, path, batchSize=1000):
+        Sink.__init__(self, path, batchSize)
+        self.__values = array('d')
+        header = self.__header(0)
+        self._file.write(header)
+        self.bytesWritten += len(header)
+
+    def __header(self, count):
+        shape = "({0}, {1})".format(str(count).rjust(self.__countWidth), len(self.fields))
+        description = "{{'descr': '<f8', 'fortran_order': False, 'shape': {0}, }}".format(shape)
+        # Magic, version, header length, then the description padded so the data starts on a 64 byte boundary.
+        length = 10 + len(description) + 1
+        description += " " * ((64 - length % 64) % 64) + "\n"
+        return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(description)) + description.encode("latin-1")
+
+    def _buffer(self, point):
+        for name in self.fields:
+            self.__values.append(getattr(point, name))
+
+    def _drain(self):
+        if struct.pack("=d", 1.0) != struct.pack("<d", 1.0):
+            self.__values.byteswap()
+        try:
+            data = self.__values.tobytes()
+        except AttributeError:
+            data = self.__values.tostring()
+        self.__values = array('d')
+        return data
+
+    def _finish(self):
+        self._file.seek(0)
+        self._file.write(self.__header(self.count))
@@ -0,0 +1,127 @@
+##
+#   Statistics.py
+#
+#   Constant memory statistics for long streams of results.
+##
+
+import math
+
+
+class Quantile:
+    """ Running estimate of a single quantile with the P-square algorithm (Jain & Chlamtac, 1985). Uses five markers
+    no matter how many values are added. """
+
+    def __init__(self, p):
+        """ :param p: float Quantile to estimate, between 0 and 1. """
+        self.p = p
+        self.count = 0
+        self.__heights = []
+        self.__positions = [1, 2, 3, 4, 5]
+        self.__desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.__increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, value):
+        self.count += 1
+        heights = self.__heights
+        if self.count <= 5:
+            heights.append(value)
+            heights.sort()
+            return
+        positions = self.__positions
+        if value < heights[0]:
+            heights[0] = value
+            cell = 0
+        elif value >= heights[4]:
+            heights[4] = value
+            cell = 3
+        else:
+            cell = 0
+            while value >= heights[cell + 1]:
+                cell += 1
+        for i in range(cell + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.__desired[i] += self.__increments[i]
+        # Move the middle markers towards their desired positions.
+        for i in range(1, 4):
+            offset = self.__desired[i] - positions[i]
+            if (offset >= 1 and positions[i + 1] - positions[i] > 1) or (
+                    offset <= -1 and positions[i - 1] - positions[i] < -1):
+                step = 1 if offset > 0 else -1
+                height = self.__parabolic(i, step)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = heights[i] + step * (heights[i + step] - heights[i]) / (positions[i + step] - positions[i])
+                heights[i] = height
+                positions[i] += step
+
+    def __parabolic(self, i, step):
+        q = self.__heights
+        n = self.__positions
+        return q[i] + step / float(n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / float(n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / float(n[i] - n[i - 1]))
+
+    def value(self):
+        """ Returns the current estimate, or None before any values have been added. """
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            index = min(len(self.__heights) - 1, int(round(self.p * (len(self.__heights) - 1))))
+            return self.__heights[index]
+        return self.__heights[2]
+
+
+class RunningStatistics:
+    """ Count, mean, variance, minimum and maximum (Welford's method) and estimated percentiles of a stream of values,
+    plus the fraction of values above a threshold. """
+
+    def __init__(self, percentiles=(5, 50, 95), threshold=None):
+        """
+        :param percentiles: list Percentiles to estimate, from 0 to 100.
+        :param threshold: float Count the values above this, or None.
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.minimum = None
+        self.maximum = None
+        self.threshold = threshold
+        self.exceeded = 0
+        self.__m2 = 0.0
+        self.__quantiles = dict((percentile, Quantile(percentile / 100.0)) for percentile in percentiles)
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.__m2 += delta * (value - self.mean)
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+        if self.threshold is not None and value > self.threshold:
+            self.exceeded += 1
+        for quantile in self.__quantiles.values():
+            quantile.add(value)
+
+    def extend(self, values):
+        for value in values:
+            self.add(value)
+
+    def variance(self):
+        """ Returns the sample variance. """
+        return self.__m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def standardDeviation(self):
+        return math.sqrt(self.variance())
+
+    def percentile(self, percentile):
+        """ Returns the estimate for one of the percentiles given to the constructor. """
+        return self.__quantiles[percentile].value()
+
+    def percentiles(self):
+        """ Returns {percentile: estimate}. """
+        return dict((percentile, quantile.value()) for percentile, quantile in self.__quantiles.items())
+
+    def exceedance(self):
+        """ Returns the fraction of values above the threshold. """
+        return self.exceeded / float(self.count) if self.count else 0.0
@@ -0,0 +1,54 @@
+##
+#   Structures.py
+#
+#   Thin walled pressure vessel stresses for the tank, and a structural screen for batches of designs.
+##
+
+
+class TankStress:
+    """ Hoop and longitudinal stress of a thin walled cylindrical tank, checked against an allowable stress with a
+    safety factor. Every method works element wise on numpy arrays as well as on floats, so a whole batch of designs
+    can be screened in one call before any of them is flown. """
+
+    def __init__(self, allowableStress=276e6, safetyFactor=1.5):
+        """
+        :param allowableStress: float Stress the tank wall may reach (Pa). Defaults to the yield strength of 6061-T6.
+        :param safetyFactor: float The peak stress times this must stay within the allowable stress.
+        """
+        self.allowableStress = allowableStress
+        self.safetyFactor = safetyFactor
+
+    @staticmethod
+    def hoopStress(pressure, radius, thickness):
+        """ sigma_h = p * r / t (Pa) """
+        return pressure * radius / thickness
+
+    @staticmethod
+    def longStress(pressure, radius, thickness):
+        """ sigma_l = p * r / (2 * t) (Pa) """
+        return pressure * radius / (2 * thickness)
+
+    def history(self, pressures, radius, thickness):
+        """ Returns (hoop stresses, longitudinal stresses) for each pressure in the tank's pressure history, as numpy
+        arrays, or lists where numpy is not installed. """
+        try:
+            import numpy
+        except ImportError:
+            return ([self.hoopStress(pressure, radius, thickness) for pressure in pressures],
+                    [self.longStress(pressure, radius, thickness) for pressure in pressures])
+        pressures = numpy.asarray(pressures, dtype=float)
+        return self.hoopStress(pressures, radius, thickness), self.longStress(pressures, radius, thickness)
+
+    def margin(self, pressure, radius, thickness):
+        """ Returns the margin of safety, allowable / (safety factor * peak stress) - 1, for the given peak tank
+        pressure. Negative means the tank fails. The hoop stress is the larger of the two, so it governs. """
+        return self.allowableStress / (self.safetyFactor * self.hoopStress(pressure, radius, thickness)) - 1
+
+    def feasible(self, pressure, radius, thickness):
+        """ Returns whether (or, for arrays, a mask of where) the tank holds the given peak pressure. The pressure
+        only falls once the flight starts, so the fill pressure is the peak. """
+        return self.safetyFactor * self.hoopStress(pressure, radius, thickness) <= self.allowableStress
+
+    def feasibleConfiguration(self, config):
+        """ Checks a dict of Solver attribute values (airPressure, tankRadius and tankThickness). """
+        return self.feasible(config["airPressure"], config["tankRadius"], config["tankThickness"])
@@ -0,0 +1,149 @@
+##
+#   Surrogate.py
+#
+#   Radial basis function response surface for the apogee, fitted to batch runs over a box of designs.
+#   Requires numpy.
+##
+
+import copy
+import json
+
+import numpy
+
+import BatchEngine
+import RocketTrajectoryCalculator
+
+
+class Surrogate:
+    """ Interpolates the apogee over a box of Solver parameters with a cubic radial basis function plus a linear
+    polynomial, fitted to a Latin hypercube of designs flown in one Solver.calculateBatch call. Parameters are scaled
+    to the unit cube before fitting.
+
+    Every sample's leave-one-out error is found exactly (Rippa's method) when the model is fitted. The error estimate
+    for a query is the inverse distance weighted leave-one-out error of the nearest samples; queries outside the box
+    have no estimate (infinite error). Like the batch engine, the model follows the fixed step profile solver. """
+    # Default parameters to vary.
+    parameters = ("airPressure", "airVolume", "waterVolume", "d_noz", "structuralMass", "payloadMass", "frontalArea")
+    neighbours = 4  # Samples whose leave-one-out errors make up the error estimate
+
+    def __init__(self, solver, bounds):
+        """
+        :param solver: Solver Baseline for the parameters that are not varied, and the fallback for query.
+        :param bounds: dict (low, high) keyed by Solver attribute name. Names must be in BatchEngine.parameters.
+        """
+        self.solver = solver
+        self.names = tuple(sorted(bounds))
+        for name in self.names:
+            if name not in BatchEngine.BatchEngine.parameters:
+                raise ValueError("{0} is not a batch parameter".format(name))
+        self.low = numpy.array([bounds[name][0] for name in self.names], dtype=float)
+        self.high = numpy.array([bounds[name][1] for name in self.names], dtype=float)
+        self.centers = None  # Samples in the unit cube, one row each
+        self.weights = None  # Radial basis function weights
+        self.polynomial = None  # Constant followed by the linear coefficients
+        self.looErrors = None  # m, leave-one-out error of each sample
+        self.simulations = 0  # Fallback flights made by query
+
+    # Fitting
+    @staticmethod
+    def latinHypercube(count, dimensions, seed=0):
+        """ Returns count points in the unit cube with exactly one point in each of count slices of every axis. """
+        generator = numpy.random.RandomState(seed)
+        points = numpy.empty((count, dimensions))
+        for axis in range(dimensions):
+            points[:, axis] = (generator.permutation(count) + generator.uniform(size=count)) / count
+        return points
+
+    def fit(self, samples=256, seed=0):
+        """ Flies a Latin hypercube of designs and fits the model to their apogees.
+        :param samples: int Number of designs.
+        :param seed: int Seed for the sample positions.
+        :rtype : Surrogate
+        """
+        unit = self.latinHypercube(samples, len(self.names), seed)
+        designs = self.low + unit * (self.high - self.low)
+        result = self.solver.calculateBatch(dict((name, designs[:, i]) for i, name in enumerate(self.names)))
+        return self.fitSamples(unit, numpy.asarray(result.apogee, dtype=float))
+
+    def fitSamples(self, unit, apogees):
+        """ Fits the model to apogees at the given points of the unit cube. """
+        count, dimensions = unit.shape
+        polynomial = numpy.hstack((numpy.ones((count, 1)), unit))
+        size = count + dimensions + 1
+        system = numpy.zeros((size, size))
+        system[:count, :count] = self.__kernel(unit[:, None, :] - unit[None, :, :])
+        system[:count, count:] = polynomial
+        system[count:, :count] = polynomial.T
+        inverse = numpy.linalg.pinv(system)
+        right = numpy.concatenate((apogees, numpy.zeros(dimensions + 1)))
+        solution = inverse.dot(right)
+        self.centers = unit
+        self.weights = solution[:count]
+        self.polynomial = solution[count:]
+        self.looErrors = numpy.abs(self.weights / numpy.diag(inverse)[:count])
+        return self
+
+    @staticmethod
+    def __kernel(offsets):
+        return numpy.sqrt((offsets ** 2).sum(axis=-1)) ** 3
+
+    # Queries
+    def __unit(self, values):
+        return (numpy.array([values[name] for name in self.names], dtype=float) - self.low) / (self.high - self.low)
+
+    def predict(self, values):
+        """ Returns (apogee, error estimate) in meters for a dict of parameter values.
+        :param values: dict Value for every varied parameter, keyed by name.
+        """
+        point = self.__unit(values)
+        distances = numpy.sqrt(((self.centers - point) ** 2).sum(axis=1))
+        apogee = (distances ** 3).dot(self.weights) + self.polynomial[0] + point.dot(self.polynomial[1:])
+        if (point < 0).any() or (point > 1).any():
+            return float(apogee), float("inf")
+        nearest = numpy.argpartition(distances, self.neighbours)[:self.neighbours]
+        if distances[nearest].min() == 0.0:
+            return float(apogee), 0.0
+        weights = 1.0 / distances[nearest]
+        return float(apogee), float(weights.dot(self.looErrors[nearest]) / weights.sum())
+
+    def query(self, values, tolerance):
+        """ Returns (apogee, error estimate, simulated): the prediction if its error estimate is within tolerance (m),
+        otherwise the apogee from a full simulation, with an error of 0. """
+        apogee, error = self.predict(values)
+        if error <= tolerance:
+            return apogee, error, False
+        solver = copy.copy(self.solver)
+        for name in self.names:
+            setattr(solver, name, values[name])
+        self.simulations += 1
+        return solver.apogee().apogee, 0.0, True
+
+    def looError(self):
+        """ Returns the root mean square leave-one-out error (m) over the samples. """
+        return float(numpy.sqrt((self.looErrors ** 2).mean()))
+
+    # Persistence
+    def save(self, path):
+        """ Writes the model, its bounds and the baseline it was fitted around to a numpy .npz file. """
+        baseline = dict((name, getattr(self.solver, name)) for name in BatchEngine.BatchEngine.parameters + ("dt",))
+        numpy.savez(path, names=numpy.array(self.names), low=self.low, high=self.high, centers=self.centers,
+                    weights=self.weights, polynomial=self.polynomial, looErrors=self.looErrors,
+                    baseline=numpy.array(json.dumps(baseline)))
+
+    @classmethod
+    def load(cls, path, solver=None):
+        """ Reads a model written by save.
+        :param solver: Solver For settings that are not saved (drag table, atmosphere). The saved baseline parameters
+        are set on it. Defaults to a new Solver.
+        """
+        data = numpy.load(path)
+        solver = solver or RocketTrajectoryCalculator.Solver()
+        for name, value in json.loads(str(data["baseline"])).items():
+            setattr(solver, name, value)
+        names = [str(name) for name in data["names"]]
+        surrogate = cls(solver, dict((name, (data["low"][i], data["high"][i])) for i, name in enumerate(names)))
+        surrogate.centers = data["centers"]
+        surrogate.weights = data["weights"]
+        surrogate.polynomial = data["polynomial"]
+        surrogate.looErrors = data["looErrors"]
+        return surrogate
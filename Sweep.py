@@ -0,0 +1,235 @@
+##
+#   Sweep.py
+#
+#   Grid sweeps and bounded optimization of Solver configurations.
+##
+
+import itertools
+import math
+import multiprocessing
+
+import RocketTrajectoryCalculator
+
+# Solver attributes that make up a configuration.
+attributes = RocketTrajectoryCalculator.attributes
+
+
+def evaluate(config):
+    """ Flies a single configuration and returns (config, apogee). Runs in the worker processes.
+    :param config: dict Solver attribute values.
+    """
+    solver = RocketTrajectoryCalculator.Solver()
+    for name, value in config.items():
+        setattr(solver, name, value)
+    return config, solver.apogee().apogee
+
+
+def evaluateChunk(configs):
+    """ Flies a list of configurations and returns a list of (config, apogee). """
+    return [evaluate(config) for config in configs]
+
+
+def evaluateAll(configs, processes, chunksize=None, worker=evaluateChunk):
+    """ Flies a list of configurations across a pool of worker processes.
+    :param processes: int Number of worker processes; 1 runs in process.
+    :param chunksize: int Configurations sent to a worker at a time. Defaults to about four chunks per worker.
+    :param worker: function Flies a list of configurations, like evaluateChunk. Must be defined at module level.
+    :rtype : list (config, apogee) in the same order as configs.
+    """
+    if processes == 1 or len(configs) < 2:
+        return worker(configs)
+    if chunksize is None:
+        chunksize = max(1, int(math.ceil(len(configs) / float(processes * 4))))
+    chunks = [configs[i:i + chunksize] for i in range(0, len(configs), chunksize)]
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = []
+        for chunk in pool.imap(worker, chunks):
+            results.extend(chunk)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+
+
+class SweepResult:
+    """ Outcome of a sweep or optimization. """
+
+    def __init__(self, results):
+        """ :param results: list (config, apogee) tuples. """
+        self.results = results
+        self.evaluations = len(results)
+        self.best = None
+        self.apogee = None
+        for config, apogee in results:
+            if apogee is not None and (self.apogee is None or apogee > self.apogee):
+                self.best = config
+                self.apogee = apogee
+
+
+class Sweep:
+    """ Searches over Solver attributes for the design with the highest apogee.
+    If totalMass is given, every design must have a dry mass (structural + payload) of at most totalMass. When a
+    design does not set structuralMass it is given whatever the payload leaves of the budget, as in main.py.
+    If screen is set, designs whose tank would not hold its fill pressure (see Structures) are dropped the same way,
+    before they are flown. """
+
+    def __init__(self, solver=None, totalMass=None, processes=None, screen=False, store=None):
+        """
+        :param solver: Solver Baseline for any attribute that is not varied, and the structures to screen with.
+        :param totalMass: float Allowable dry mass (kg), or None for no limit.
+        :param processes: int Number of worker processes. Defaults to the number of CPUs; 1 runs in process.
+        :param screen: bool Skip designs that fail the solver's structural check.
+        :param store: ResultsStore Reuse results already in the store and add the new ones to it.
+        """
+        solver = solver or RocketTrajectoryCalculator.Solver()
+        self.baseline = dict((name, getattr(solver, name)) for name in attributes)
+        self.totalMass = totalMass
+        self.structures = solver.structures if screen else None
+        self.store = store
+        self.processes = processes or multiprocessing.cpu_count()
+
+    @staticmethod
+    def steps(start, stop, count):
+        """ Returns count evenly spaced values from start to stop, inclusive. """
+        if count < 2:
+            return [start]
+        return [start + (stop - start) * i / float(count - 1) for i in range(count)]
+
+    def configuration(self, values):
+        """ Returns the full configuration for the given attribute values, or None if it breaks the mass limit or
+        fails the structural screen. """
+        config = dict(self.baseline)
+        config.update(values)
+        if self.totalMass is not None:
+            if "structuralMass" not in values:
+                config["structuralMass"] = self.totalMass - config["payloadMass"]
+            if config["structuralMass"] < 0 or config["structuralMass"] + config["payloadMass"] > self.totalMass * (
+                    1 + 1e-9):
+                return None
+        if self.structures is not None and not self.structures.feasibleConfiguration(config):
+            return None
+        return config
+
+    def grid(self, ranges):
+        """ Yields every feasible configuration in the cartesian product of the given ranges.
+        :param ranges: dict Lists of values keyed by Solver attribute name.
+        """
+        names = sorted(ranges)
+        for combination in itertools.product(*[ranges[name] for name in names]):
+            config = self.configuration(dict(zip(names, combination)))
+            if config is not None:
+                yield config
+
+    def run(self, ranges, chunksize=None):
+        """ Flies every configuration in the grid across the worker pool.
+        :param ranges: dict Lists of values keyed by Solver attribute name.
+        :param chunksize: int Configurations sent to a worker at a time. Defaults to about four chunks per worker.
+        :rtype : SweepResult
+        """
+        configs = list(self.grid(ranges))
+        if self.store is not None:
+            rows = self.store.evaluate(configs, self.processes, chunksize)
+            return SweepResult([(config, row["apogee"]) for config, row in zip(configs, rows)])
+        return SweepResult(evaluateAll(configs, self.processes, chunksize))
+
+    def optimize(self, bounds, maxEvaluations=60, tolerance=1e-3):
+        """ Searches for the highest apogee within the given bounds, flying at most maxEvaluations designs.
+        A single attribute uses a golden-section search, several use Nelder-Mead.
+        :param bounds: dict (low, high) keyed by Solver attribute name.
+        :param maxEvaluations: int Limit on the number of flights.
+        :param tolerance: float Stop once the search has narrowed to this fraction of each range.
+        :rtype : SweepResult
+        """
+        names = sorted(bounds)
+        results = []
+
+        def objective(unit):
+            """ Negative apogee for a point in the unit cube, so the searches minimize. """
+            values = {}
+            for name, u in zip(names, unit):
+                low, high = bounds[name]
+                values[name] = low + (high - low) * min(1.0, max(0.0, u))
+            config = self.configuration(values)
+            if config is None:
+                results.append((values, None))
+                return float("inf")
+            results.append(evaluate(config))
+            return -results[-1][1]
+
+        if len(names) == 1:
+            self.__goldenSection(objective, maxEvaluations, tolerance)
+        else:
+            self.__nelderMead(objective, len(names), maxEvaluations, tolerance)
+        return SweepResult(results)
+
+    @staticmethod
+    def __goldenSection(objective, maxEvaluations, tolerance):
+        ratio = (math.sqrt(5) - 1) / 2
+        low, high = 0.0, 1.0
+        a = high - ratio * (high - low)
+        b = low + ratio * (high - low)
+        fa, fb = objective([a]), objective([b])
+        evaluations = 2
+        while high - low > tolerance and evaluations < maxEvaluations:
+            if fa < fb:
+                high, b, fb = b, a, fa
+                a = high - ratio * (high - low)
+                fa = objective([a])
+            else:
+                low, a, fa = a, b, fb
+                b = low + ratio * (high - low)
+                fb = objective([b])
+            evaluations += 1
+
+    @staticmethod
+    def __nelderMead(objective, dimensions, maxEvaluations, tolerance):
+        # Start from the middle of the box with a simplex spanning a quarter of each range.
+        simplex = [[0.5] * dimensions]
+        for i in range(dimensions):
+            vertex = [0.5] * dimensions
+            vertex[i] += 0.25
+            simplex.append(vertex)
+        scores = [objective(vertex) for vertex in simplex]
+        evaluations = len(simplex)
+        while evaluations < maxEvaluations:
+            order = sorted(range(len(simplex)), key=lambda i: scores[i])
+            simplex = [simplex[i] for i in order]
+            scores = [scores[i] for i in order]
+            size = max(max(abs(vertex[i] - simplex[0][i]) for vertex in simplex) for i in range(dimensions))
+            if size < tolerance:
+                break
+            centroid = [sum(vertex[i] for vertex in simplex[:-1]) / dimensions for i in range(dimensions)]
+            worst = simplex[-1]
+
+            def towards(scale):
+                return [min(1.0, max(0.0, c + scale * (w - c))) for c, w in zip(centroid, worst)]
+
+            reflected = towards(-1.0)
+            reflectedScore = objective(reflected)
+            evaluations += 1
+            if reflectedScore < scores[0] and evaluations < maxEvaluations:
+                expanded = towards(-2.0)
+                expandedScore = objective(expanded)
+                evaluations += 1
+                if expandedScore < reflectedScore:
+                    simplex[-1], scores[-1] = expanded, expandedScore
+                else:
+                    simplex[-1], scores[-1] = reflected, reflectedScore
+            elif reflectedScore < scores[-2]:
+                simplex[-1], scores[-1] = reflected, reflectedScore
+            elif evaluations < maxEvaluations:
+                contracted = towards(0.5)
+                contractedScore = objective(contracted)
+                evaluations += 1
+                if contractedScore < scores[-1]:
+                    simplex[-1], scores[-1] = contracted, contractedScore
+                else:
+                    # Shrink towards the best vertex.
+                    best = simplex[0]
+                    for i in range(1, len(simplex)):
+                        if evaluations >= maxEvaluations:
+                            break
+                        simplex[i] = [b + 0.5 * (v - b) for b, v in zip(best, simplex[i])]
+                        scores[i] = objective(simplex[i])
+                        evaluations += 1
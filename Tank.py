@@ -0,0 +1,179 @@
+##
+#   Tank.py
+#
+#   Pressure tank model: the water burn and air blowdown behind ThrustProfile, and the tank state carried through the
+#   flight by the rocket's "coupled" engine.
+##
+
+import math
+
+
+class Tank:
+    """ Water mass, air volume, air mass and pressure of the tank, advanced one step at a time.
+
+    ThrustProfile.getThrustProfile runs step() to completion up front, and the coupled engine advances it alongside
+    the rocket, so a fixed step flight with either engine takes the same steps. derivative() is the same model written
+    as differential equations over [water mass, air volume, air mass], for the adaptive integrator. The flow equations
+    are class methods that work element wise on numpy arrays too, for BatchEngine. Like getThrustProfile, the tank is
+    filled with the air volume as its water and the water volume as its air. """
+    # Constants
+    p_atmosphere = 101.01  # Pa
+    rho_water = 1000.0  # kg/m^3
+    gasConstant = 287  # J/(kg K)
+    temperature = 293  # K
+    gamma = 1.4  # Adiabatic index of the expanding air
+    dischargeCoefficient = 0.98  # Water through the nozzle
+    # Phases
+    BURN = 0  # Water is being pushed out
+    BLOWDOWN = 1  # The remaining air is escaping
+    DONE = 2
+    # Current Values
+    phase = BURN
+    m_water = 0.0  # kg
+    m_air = 0.0  # kg
+    vol_air = 0.0  # m^3
+    vol_water = 0.0  # m^3
+    p_air = 0.0  # Pa
+    u_e = 0.0  # m/s, exhaust velocity from the last step
+    thrust = 0.0  # N, from the last step
+    massflow = 0.0  # kg/s, from the last step
+
+    def __init__(self, p_air, vol_air, vol_water, noz, p_atmosphere=p_atmosphere):
+        """ Arguments are the same as ThrustProfile.getThrustProfile.
+        :param p_atmosphere: float Pressure the nozzle exhausts into (Pa).
+        """
+        self.p_atmosphere = p_atmosphere
+        self.p_air_total = p_air
+        self.vol_water_total = vol_air
+        self.vol_air_total = vol_water
+        self.volume = vol_air + vol_water  # m^3
+        self.area = self.nozzleArea(noz)
+        self.m_water = self.rho_water * self.vol_water_total
+        self.m_air = self.airMass(self.vol_air_total, p_air)
+        self.vol_air = self.vol_air_total
+        self.vol_water = self.vol_water_total
+        self.p_air = p_air
+        self.phase = self.BURN
+
+    # Model
+    @staticmethod
+    def nozzleArea(noz):
+        """ A = pi * (d / 2)^2 (m^2) """
+        return 3.14 * (noz / 2) ** 2
+
+    @classmethod
+    def airMass(cls, volume, pressure):
+        """ m_air = V * (P / RT) (kg) """
+        return volume * (pressure / (cls.gasConstant * cls.temperature))
+
+    @classmethod
+    def airPressure(cls, m_air, volume):
+        """ P = m_air / V * RT (Pa) """
+        return m_air / volume * (cls.temperature * cls.gasConstant)
+
+    @classmethod
+    def waterFlow(cls, p_air, p_atmosphere, area, sqrt=math.sqrt):
+        """ Returns (exhaust velocity, mass flow) of the water, from Bernoulli's with no loss inside the tank:
+        u_e = sqrt(2 * dp / rho), m_dot = rho * u_e * A * C_d.
+        :param sqrt: function Square root, numpy.sqrt for arrays.
+        """
+        u_e = sqrt(2 * abs(p_air - p_atmosphere) / cls.rho_water)
+        return u_e, cls.rho_water * u_e * area * cls.dischargeCoefficient
+
+    @classmethod
+    def airFlow(cls, p_air, p_atmosphere, area, sqrt=math.sqrt):
+        """ Returns (exhaust velocity, mass flow) of the air in blowdown: u_e = sqrt(2 * dp / rho_air),
+        m_dot = rho_air * u_e * A.
+        :param sqrt: function Square root, numpy.sqrt for arrays.
+        """
+        rho_air = p_air / (cls.gasConstant * cls.temperature)
+        u_e = sqrt(2 * abs(p_air - p_atmosphere) / rho_air)
+        return u_e, rho_air * u_e * area
+
+    @staticmethod
+    def blowdownThrust(m_dot, u_e, p_air, p_atmosphere, area):
+        """ thrust = m_dot * u_e + A * (p_e - p_a) (N) """
+        return m_dot * u_e + area * (p_air - p_atmosphere)
+
+    def fuelMass(self):
+        return self.m_water + self.m_air
+
+    def step(self, dt):
+        """ Advances the tank by dt. Returns False, leaving the tank alone, once there is no more thrust. The phase
+        moves on at the start of the step after the water runs out or the pressure reaches ambient, and straight to
+        DONE if the pressure falls below ambient while there is still water. """
+        if self.phase == self.BURN and not self.m_water > 0:
+            self.phase = self.BLOWDOWN
+        if self.phase == self.BLOWDOWN and not self.p_air > self.p_atmosphere:
+            self.phase = self.DONE
+        if self.phase == self.BURN:
+            self.u_e, m_dot = self.waterFlow(self.p_air, self.p_atmosphere, self.area)
+            self.m_water -= m_dot * dt
+            oldVolumeAir = self.vol_air
+            dv = m_dot * dt / self.rho_water
+            self.vol_water -= dv
+            self.vol_air += dv
+            self.p_air *= (oldVolumeAir / self.vol_air) ** self.gamma
+            self.thrust = m_dot * self.u_e
+            self.massflow = m_dot
+            if self.p_air < self.p_atmosphere:
+                self.phase = self.DONE
+            return True
+        if self.phase == self.BLOWDOWN:
+            self.u_e, m_dot = self.airFlow(self.p_air, self.p_atmosphere, self.area)
+            self.m_air -= m_dot * dt
+            self.p_air = self.airPressure(self.m_air, self.volume)
+            # The pressure term uses the pressure after the step.
+            self.thrust = self.blowdownThrust(m_dot, self.u_e, self.p_air, self.p_atmosphere, self.area)
+            self.massflow = m_dot
+            return True
+        self.thrust = 0.0
+        self.massflow = 0.0
+        return False
+
+    # Continuous form, for the adaptive integrator.
+    def state(self):
+        """ Returns [water mass, air volume, air mass]. """
+        return [self.m_water, self.vol_air, self.m_air]
+
+    def setState(self, state):
+        self.m_water, self.vol_air, self.m_air = state
+        self.p_air = self.pressure(state)
+
+    def pressure(self, state):
+        """ Air pressure (Pa) for a [water mass, air volume, air mass] state in the current phase: adiabatic
+        expansion while there is water, the ideal gas law over the whole tank after. """
+        if self.phase == self.BURN:
+            return self.p_air_total * (self.vol_air_total / state[1]) ** self.gamma
+        return self.airPressure(state[2], self.volume)
+
+    def derivative(self, state):
+        """ Returns (thrust, [d water mass, d air volume, d air mass]) for the state in the current phase. """
+        if self.phase == self.BURN:
+            u_e, m_dot = self.waterFlow(self.pressure(state), self.p_atmosphere, self.area)
+            return m_dot * u_e, [-m_dot, m_dot / self.rho_water, 0.0]
+        if self.phase == self.BLOWDOWN:
+            p_air = self.pressure(state)
+            if p_air <= self.p_atmosphere:
+                # Only reached by trial states past the end of blowdown.
+                return 0.0, [0.0, 0.0, 0.0]
+            u_e, m_dot = self.airFlow(p_air, self.p_atmosphere, self.area)
+            return self.blowdownThrust(m_dot, u_e, p_air, self.p_atmosphere, self.area), [0.0, 0.0, -m_dot]
+        return 0.0, [0.0, 0.0, 0.0]
+
+    def events(self, state):
+        """ Returns the values whose sign change ends the current phase: the water mass and the pressure above
+        ambient while burning, the pressure above ambient during blowdown. """
+        if self.phase == self.BURN:
+            return [state[0], self.pressure(state) - self.p_atmosphere]
+        if self.phase == self.BLOWDOWN:
+            return [self.pressure(state) - self.p_atmosphere]
+        return []
+
+    def nextPhase(self, state, event):
+        """ Moves to the phase that follows the one ended by the given index into events(). """
+        if self.phase == self.BURN and event == 0 and self.pressure(state) > self.p_atmosphere:
+            self.phase = self.BLOWDOWN
+        else:
+            self.phase = self.DONE
+        self.setState(state)
@@ -0,0 +1,127 @@
+##
+#   ThrustCurve.py
+#
+#   Array backed thrust profile used by the rocket for fast lookups during the flight.
+##
+
+from array import array
+from bisect import bisect_right
+
+
+class ThrustCurve:
+    """ Stores a thrust profile as contiguous columns of time, thrust, mass flow, mass and tank pressure. Lookups interpolate
+    linearly between samples and return 0 for any time after the end of the profile. """
+    # Relative slack allowed when comparing times, so accumulated float drift never misses a sample.
+    __epsilon = 1e-9
+    columnNames = ("time", "thrust", "massflow", "mass", "water", "pressure")
+
+    def __init__(self, flightStats):
+        """ Builds the curve from the list of tuples returned by ThrustProfile.getThrustProfile.
+        :param flightStats: list {Time, Thrust, MassFlow, Current Mass, ...} tuples ordered by time.
+        """
+        self.time = array('d')
+        self.thrust = array('d')
+        self.massflow = array('d')
+        self.mass = array('d')
+        self.water = array('d')
+        self.pressure = array('d')  # Pa
+        for moment in flightStats:
+            self.time.append(moment[0])
+            self.thrust.append(moment[1])
+            self.massflow.append(moment[2])
+            self.mass.append(moment[3])
+            self.water.append(moment[9])
+            if len(moment) > 10:
+                self.pressure.append(moment[10])
+        self.volume = flightStats[0][6] + flightStats[0][7] if len(flightStats) > 0 else 0.0  # Tank volume (m^3)
+        self.__index()
+
+    @classmethod
+    def fromColumns(cls, columns, volume):
+        """ Builds the curve from plain sequences, as returned by columns().
+        :param columns: dict Sequences of floats keyed by column name.
+        :param volume: float Tank volume (m^3).
+        """
+        curve = cls([])
+        for name in cls.columnNames:
+            getattr(curve, name).extend(columns[name])
+        curve.volume = volume
+        curve.__index()
+        return curve
+
+    def columns(self):
+        """ Returns every column as a list of floats, keyed by name. """
+        return dict((name, getattr(self, name).tolist()) for name in self.columnNames)
+
+    def __index(self):
+        """ Sets the sample count, burn times and step from the columns. """
+        self.count = len(self.time)
+        self.burnTime = self.time[-1] if self.count > 0 else 0.0
+        self.burnoutTime = self.__waterExhausted()
+        self.__step = self.__uniformStep()
+
+    def __waterExhausted(self):
+        """ Returns the time the water runs out, found by interpolating the water mass to zero. """
+        for i in range(self.count):
+            if self.water[i] <= 0:
+                if i == 0:
+                    return self.time[0]
+                fraction = self.water[i - 1] / (self.water[i - 1] - self.water[i])
+                return self.time[i - 1] + fraction * (self.time[i] - self.time[i - 1])
+        return self.burnTime
+
+    def __uniformStep(self):
+        """ Returns the sample spacing if the samples are evenly spaced, otherwise 0. """
+        if self.count < 2:
+            return 0.0
+        step = (self.time[-1] - self.time[0]) / (self.count - 1)
+        tolerance = step * 1e-6
+        for i in range(1, self.count):
+            if abs(self.time[i] - self.time[i - 1] - step) > tolerance:
+                return 0.0
+        return step
+
+    def __locate(self, time):
+        """ Returns the index of the sample at or before the given time and the fraction of the way to the next
+        sample, or None if the time is outside of the profile.
+        :param time: float Burn time in seconds
+        """
+        if self.count == 0 or time < 0 or time > self.burnTime + self.__epsilon * max(1.0, time):
+            return None
+        if time <= self.time[0]:
+            # Ignition: hold the first sample.
+            return 0, 0.0
+        if self.__step > 0.0:
+            # Evenly spaced samples can be indexed directly.
+            index = int((time - self.time[0]) / self.__step)
+            if index < self.count - 1 and self.time[index + 1] <= time:
+                index += 1
+            elif index > 0 and self.time[index] > time:
+                index -= 1
+        else:
+            index = bisect_right(self.time, time) - 1
+        if index >= self.count - 1:
+            return self.count - 1, 0.0
+        return index, (time - self.time[index]) / (self.time[index + 1] - self.time[index])
+
+    def __valueAt(self, column, time):
+        location = self.__locate(time)
+        if location is None:
+            return 0.0
+        index, fraction = location
+        if fraction == 0.0:
+            return column[index]
+        return column[index] + fraction * (column[index + 1] - column[index])
+
+    # Public Methods
+    def thrustAt(self, time):
+        """ Returns the interpolated thrust (N) at the given time. """
+        return self.__valueAt(self.thrust, time)
+
+    def massflowAt(self, time):
+        """ Returns the interpolated mass flow (kg/s) at the given time. """
+        return self.__valueAt(self.massflow, time)
+
+    def massAt(self, time):
+        """ Returns the interpolated propellant mass (kg) at the given time. """
+        return self.__valueAt(self.mass, time)
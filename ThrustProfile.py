@@ -6,7 +6,8 @@
 #   This script uses initial values to calculate a mass flow, and therefor a thrust profile.
 ##
 
-import math
+import Sinks
+import Tank
 
 
 class ThrustProfile:
@@ -17,9 +18,9 @@ class ThrustProfile:
     vol_water_total = .005  # m^3 ~1Gal
     vol_air_total = .0075  # m^3 ~1.5Gal
     dt = 0.01
-    # Constants
-    p_atmosphere = 101.01  # Pa
-    rho_water = 1000.0  # kg/m^3
+    # Constants (see Tank)
+    p_atmosphere = Tank.Tank.p_atmosphere  # Pa
+    rho_water = Tank.Tank.rho_water  # kg/m^3
     d_noz = 0.01  # m
     m_water_total = 0  # kg
     m_air_total = 0  # kg
@@ -33,11 +34,14 @@ class ThrustProfile:
     m_dot_air = 0
     time = 0
     u_e = 0
-    # Output Stuff
-    thrust = []
-    m_dot_list = []
-    m_water_list = []
-    time_list = []
+    tank = None  # Tank being stepped, see init
+    # Output Stuff (per run, see init)
+    outputPath = "_thrust_profile.csv"
+    bytesWritten = 0
+    thrust = None
+    m_dot_list = None
+    m_water_list = None
+    time_list = None
 
     # Init starting values.
     def __init__(self):
@@ -45,9 +49,10 @@ class ThrustProfile:
 
     def init(self):
         """ Custom Constructor """
-        # m_air = V * (P/RT)
-        self.m_water_total = self.rho_water * self.vol_water_total
-        self.m_air_total = self.vol_air_total * (self.p_air_total / (287 * 293))
+        # The tank takes the volumes in getThrustProfile's order, and swaps them back.
+        self.tank = Tank.Tank(self.p_air_total, self.vol_water_total, self.vol_air_total, self.d_noz, self.p_atmosphere)
+        self.m_water_total = self.tank.m_water
+        self.m_air_total = self.tank.m_air
         self.m_air_current = self.m_air_total
         self.m_water_current = self.m_water_total
         self.vol_air_current = self.vol_air_total
@@ -55,10 +60,13 @@ class ThrustProfile:
         self.p_air_current = self.p_air_total
         self.time = 0
         self.u_e = 0
+        self.thrust = []
+        self.m_dot_list = []
+        self.m_water_list = []
+        self.time_list = []
 
     # Output to file and console.
     def output(self):
-        of = open("_thrust_profile.csv", "w")
         count = len(self.thrust)
         # Add metadata to file.
         foo = "Burntime (s),{0}\nTotal Air Pressure (kPA),{1}\nTotal Air Mass (kg),{2}\nTotal Water Mass (kg),{3}\n" \
@@ -71,27 +79,13 @@ class ThrustProfile:
                 abs(self.vol_air_total) / (self.vol_air_total + self.vol_water_total) * 100), str(
                 abs(self.m_air_total) / (self.m_air_total + self.m_water_total) * 100), str(
                 abs(self.m_water_total) / (self.m_air_total + self.m_water_total) * 100))
-        of.write(foo)
-        # Time
-        of.write("Time (s),")
-        for i in range(count):
-            of.write(str(self.time_list[i]) + ",")
-        of.write("\n")
-        # Thrust Profile
-        of.write("Thrust Profile (N),")
-        for i in range(count):
-            of.write(str(self.thrust[i]) + ",")
-        of.write("\n")
-        # M_dot
-        of.write("Mass Flow (kg/s),")
-        for i in range(count):
-            of.write(str(self.m_dot_list[i]) + ",")
-        of.write("\n")
-        # M_water
-        of.write("Fuel Mass (kg),")
-        for i in range(count):
-            of.write(str(self.m_water_list[i]) + ",")
-        of.close()
+        rows = [foo]
+        # Time, Thrust Profile, M_dot, M_water
+        for title, values, end in (("Time (s),", self.time_list, "\n"), ("Thrust Profile (N),", self.thrust, "\n"),
+                                   ("Mass Flow (kg/s),", self.m_dot_list, "\n"),
+                                   ("Fuel Mass (kg),", self.m_water_list, "")):
+            rows.append(title + "".join(str(values[i]) + "," for i in range(count)) + end)
+        self.bytesWritten = Sinks.writeFile(self.outputPath, "".join(rows))
 
         # Print to the console.
         print "\nBurn time: " + str(self.time) + " s"
@@ -107,98 +101,59 @@ class ThrustProfile:
             abs(self.m_water_total) / (self.m_air_total + self.m_water_total) * 100)
         print "Total Air/Water Volumes: " + str(self.vol_air_total) + "m^3, " + str(self.vol_water_total) + "m^3"
 
-    # Calculate a mass flow.
-    def massflow(self):
-        """ m_dot = rho * u_e * A """
-        # Via Bernoulli's
-        # Assuming no loss of water inside the tank.
-
-        self.u_e = math.sqrt(2 * abs(self.p_air_current - self.p_atmosphere) / self.rho_water)
-        area = 3.14 * pow((self.d_noz / 2), 2)  # Get Nozzle area
-        self.m_dot_water = self.rho_water * self.u_e * area * 0.98  # Get new mass flow. The .98 is the C_d for orifice.
-        self.m_dot_list.append(self.m_dot_water)
-        self.m_water_current -= self.m_dot_water * self.dt  # update water mass.
-        self.m_water_list.append(self.m_water_current)
-        oldVolumeAir = self.vol_air_current
-        dv = self.m_dot_water * self.dt / self.rho_water  # Get the change in volume
-        self.vol_water_current -= dv  # Decrement the water volume.
-        self.vol_air_current += dv  # Increment the air volume.
-        self.p_air_current *= (oldVolumeAir / self.vol_air_current) ** 1.4  # Get the new air pressure
-
-    # Calculate thrust profile.
-    def calcThrust(self):
-        """ thrust = m_dot * u_e + A * (p_a - p_e) """
-        self.thrust.append(self.m_dot_water * self.u_e)
-
-    def calcBlowdownThrust(self):
-        # Blowdown Calcs
-        global m_dot_air
-        area = 3.14 * (self.d_noz / 2) ** 2
-        self.thrust.append((self.m_dot_air * self.u_e) + area * (self.p_air_current - self.p_atmosphere))
-
-    def massFlowBlowdown(self):
-        """ m_dot = rho * u_e * A """
-        # Via Bernoulli's
-        # Assuming no loss of water inside the tank.
-        rho_air = self.p_air_current / (287 * 293)
-        self.u_e = math.sqrt(2 * abs(self.p_air_current - self.p_atmosphere) / rho_air)
-        area = 3.14 * pow((self.d_noz / 2), 2)  # Get Nozzle area
-        self.m_dot_air = rho_air * self.u_e * area  # Get new mass flow.
-        self.m_dot_list.append(self.m_dot_air)
-        self.m_air_current -= self.m_dot_air * self.dt  # update air mass.
-        self.m_water_list.append(self.m_air_current)
-        self.p_air_current = self.m_air_current / (self.vol_air_total + self.vol_water_total) * (293 * 287)
-
+    # Calculate a mass flow and thrust.
+    def step(self):
+        """ Advances the tank by dt (see Tank.step) and records the sample. Returns False, recording nothing, once
+        there is no more thrust. """
+        tank = self.tank
+        if not tank.step(self.dt):
+            return False
+        self.time += self.dt
+        self.time_list.append(self.time)
+        self.p_air_current = tank.p_air
+        self.vol_air_current = tank.vol_air
+        self.vol_water_current = tank.vol_water
+        self.m_water_current = tank.m_water
+        self.m_air_current = tank.m_air
+        self.u_e = tank.u_e
+        self.thrust.append(tank.thrust)
+        self.m_dot_list.append(tank.massflow)
+        # The fuel mass is the water during the burn and the air during the blowdown.
+        if tank.phase == tank.BLOWDOWN:
+            self.m_dot_air = tank.massflow
+            self.m_water_list.append(tank.m_air)
+        else:
+            self.m_dot_water = tank.massflow
+            self.m_water_list.append(tank.m_water)
+        return True
 
     def main(self):
         print "\nStarting..."
         self.init()
-        while self.m_water_current > 0:
-            self.time += self.dt
-            # Do Mass Flow/Thrust Analysis
-            self.massflow()
-            self.calcThrust()
-            if self.p_air_current < self.p_atmosphere:
-                break
+        while self.m_water_current > 0 and self.tank.phase == self.tank.BURN:
+            self.step()
         self.output()
         print "Ending...\n"
 
     # Public method.
-    def getThrustProfile(self, p_air, vol_air, vol_water, noz):
+    def getThrustProfile(self, p_air, vol_air, vol_water, noz, write=True):
         """ Returns a list of tuples {Time, Thrust, MassFlow, Current Mass, Current Air Volume, Current Water Volume,
-        Total Air Volume, Total Water Volume, Current Air Mass, Current Water Mass} for the entire burn. WARNING: Does
-        not include blow-down. """
+        Total Air Volume, Total Water Volume, Current Air Mass, Current Water Mass, Current Air Pressure} for the
+        entire burn. WARNING: Does not include blow-down.
+        :param write: bool Whether to write the profile to file and console. """
         self.d_noz = noz
         self.p_air_total = p_air  # Pa
         self.vol_water_total = vol_air  # m^3
         self.vol_air_total = vol_water  # m^3
         self.init()
         stuff = []
-        self.init()
-        # Burn
-        while self.m_water_current > 0:
-            self.time += self.dt
-            self.time_list.append(self.time)
-            # Do Mass Flow/Thrust Analysis
-            self.massflow()
-            self.calcThrust()
+        # Burn, then blow down
+        while self.step():
             item = self.time, self.thrust[-1], self.m_dot_list[-1], (
                 self.m_water_current + self.m_air_current), self.vol_air_current, self.vol_water_current, \
-                   self.vol_air_total, self.vol_water_total, self.m_air_current, self.m_water_current
+                   self.vol_air_total, self.vol_water_total, self.m_air_current, self.m_water_current, \
+                   self.p_air_current
             stuff.append(item)
-            if self.p_air_current < self.p_atmosphere:
-                break
-        # Blow down
-        while self.p_air_current > self.p_atmosphere:
-            self.time += self.dt
-            self.time_list.append(self.time)
-            # Mass Flow analysis
-            self.massFlowBlowdown()
-            self.calcBlowdownThrust()
-            # Add shit to list
-            item = self.time, self.thrust[-1], self.m_dot_list[-1], (
-                self.m_water_current + self.m_air_current), self.vol_air_current, self.vol_water_current, \
-                   self.vol_air_total, self.vol_water_total, self.m_air_current, self.m_water_current
-            stuff.append(item)
-        self.output()
+        if write:
+            self.output()
         return stuff
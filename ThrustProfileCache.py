@@ -0,0 +1,136 @@
+##
+#   ThrustProfileCache.py
+#
+#   Memoized thrust curves, keyed on the propulsion parameters that determine them.
+##
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import ThrustCurve
+import ThrustProfile
+
+# Modules whose source changes the curves. Their hash is part of every key, so curves stored by older code are
+# never served.
+sourceModules = ("Tank.py", "ThrustCurve.py", "ThrustProfile.py")
+formatVersion = 2  # Layout of the files on disk
+
+
+def sourceVersion():
+    """ Returns a hash of the modules that produce the curves. """
+    digest = hashlib.sha1()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in sourceModules:
+        sourceFile = open(os.path.join(directory, name), "rb")
+        try:
+            digest.update(sourceFile.read())
+        finally:
+            sourceFile.close()
+    return digest.hexdigest()[:16]
+
+
+class ThrustProfileCache:
+    """ Least recently used cache of ThrustCurves keyed on (air pressure, air volume, water volume, nozzle diameter,
+    dt, ambient pressure), each rounded to a fixed number of significant digits, and on the version of the code that
+    made them. If a directory is given, curves are also stored on disk there, as plain columns of floats, so later
+    processes can reuse them. Safe to share between threads. """
+
+    def __init__(self, size=128, directory=None, digits=10, version=None):
+        """
+        :param size: int Most curves kept in memory.
+        :param directory: str Folder for the on-disk cache, or None to keep curves in memory only.
+        :param digits: int Significant digits each parameter is rounded to when building the key.
+        :param version: str Code version to store and look up curves under. Defaults to sourceVersion().
+        """
+        self.version = "{0}:{1}".format(formatVersion, version or sourceVersion())
+        self.size = size
+        self.directory = directory
+        self.digits = digits
+        self.hits = 0
+        self.misses = 0
+        self.__curves = OrderedDict()
+        self.__lock = threading.Lock()
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, p_air, vol_air, vol_water, noz, dt, p_atmosphere):
+        """ Returns the cache key for the given parameters. """
+        return (self.version,) + tuple(float("{0:.{1}g}".format(value, self.digits))
+                                       for value in (p_air, vol_air, vol_water, noz, dt, p_atmosphere))
+
+    def getThrustCurve(self, p_air, vol_air, vol_water, noz, dt=ThrustProfile.ThrustProfile.dt,
+                       p_atmosphere=ThrustProfile.ThrustProfile.p_atmosphere):
+        """ Returns the ThrustCurve for the given parameters, only running ThrustProfile if it is not cached.
+        Arguments are the same as ThrustProfile.getThrustProfile, plus the ThrustProfile's dt and ambient pressure. """
+        key = self.key(p_air, vol_air, vol_water, noz, dt, p_atmosphere)
+        with self.__lock:
+            curve = self.__curves.get(key)
+            if curve is not None:
+                self.__curves[key] = self.__curves.pop(key)  # Most recently used goes to the end.
+                self.hits += 1
+                return curve
+        curve = self.__load(key)
+        if curve is None:
+            thrustProfile = ThrustProfile.ThrustProfile()
+            thrustProfile.dt = dt
+            thrustProfile.p_atmosphere = p_atmosphere
+            curve = ThrustCurve.ThrustCurve(thrustProfile.getThrustProfile(p_air, vol_air, vol_water, noz, False))
+            self.__store(key, curve)
+        with self.__lock:
+            self.misses += 1
+            self.__curves[key] = curve
+            while len(self.__curves) > self.size:
+                self.__curves.popitem(last=False)
+        return curve
+
+    def clear(self):
+        """ Empties the in-memory cache. Files on disk are left alone. """
+        with self.__lock:
+            self.__curves.clear()
+
+    def __len__(self):
+        return len(self.__curves)
+
+    def __path(self, key):
+        name = hashlib.sha1(repr(key).encode("latin-1")).hexdigest()
+        return os.path.join(self.directory, name + ".curve")
+
+    def __load(self, key):
+        if self.directory is None:
+            return None
+        path = self.__path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            curveFile = open(path, "rb")
+            try:
+                storedKey, columns, volume = pickle.load(curveFile)
+            finally:
+                curveFile.close()
+            if storedKey != key:
+                return None
+            return ThrustCurve.ThrustCurve.fromColumns(columns, volume)
+        except Exception:
+            # Unreadable, or written in another format: fly the profile again and overwrite it.
+            return None
+
+    def __store(self, key, curve):
+        if self.directory is None:
+            return
+        path = self.__path(key)
+        temporaryPath = "{0}.{1}.{2}.tmp".format(path, os.getpid(), threading.current_thread().ident)
+        curveFile = open(temporaryPath, "wb")
+        try:
+            pickle.dump((key, curve.columns(), curve.volume), curveFile, 2)
+        finally:
+            curveFile.close()
+        if os.name == "nt" and os.path.exists(path):
+            os.remove(path)
+        os.rename(temporaryPath, path)
+
+
+# Shared by every Solver in the process unless it is given its own.
+default = ThrustProfileCache()
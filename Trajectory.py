@@ -0,0 +1,80 @@
+##
+#   Trajectory.py
+#
+#   Columnar storage for the points of a flight.
+##
+
+import sys
+from array import array
+
+import Point
+
+
+class Trajectory:
+    """ Stores a flight as one typed array per field instead of one Point per step. Indexing and iteration give
+    Point views built on demand, and column() hands out the underlying array without copying. """
+    fields = ("time", "x", "y", "velocity", "acceleration", "drag", "thrust", "mach", "mass")
+
+    def __init__(self):
+        self.time = array('d')
+        self.x = array('d')
+        self.y = array('d')
+        self.velocity = array('d')
+        self.acceleration = array('d')
+        self.drag = array('d')
+        self.thrust = array('d')
+        self.mach = array('d')
+        self.mass = array('d')
+        self.comments = {}  # {index: comment}, most points have none.
+        self.count = 0
+
+    def append(self, time, x, y, velocity, acceleration, drag=0.0, thrust=0.0, mach=0.0, mass=0.0, comment=""):
+        """ Adds a point to the end of the trajectory. """
+        self.time.append(time)
+        self.x.append(x)
+        self.y.append(y)
+        self.velocity.append(velocity)
+        self.acceleration.append(acceleration)
+        self.drag.append(drag)
+        self.thrust.append(thrust)
+        self.mach.append(mach)
+        self.mass.append(mass)
+        if comment:
+            self.comments[self.count] = comment
+        self.count += 1
+
+    def byteSize(self):
+        """ Returns the bytes held by the columns and comments. """
+        return (sum(len(getattr(self, name)) * getattr(self, name).itemsize for name in self.fields) +
+                sys.getsizeof(self.comments))
+
+    def appendPoint(self, point):
+        """ Adds a copy of the given Point to the end of the trajectory. """
+        self.append(point.time, point.x, point.y, point.velocity, point.acceleration, point.drag, point.thrust,
+                    point.mach, point.mass, point.comment)
+
+    def column(self, name):
+        """ Returns the array for the given field. This is the live storage, not a copy.
+        :param name: str One of Trajectory.fields
+        :rtype : array
+        """
+        if name not in self.fields:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        """ Returns a Point for the given index. Negative indexes count from the end. """
+        if index < 0:
+            index += self.count
+        if index < 0 or index >= self.count:
+            raise IndexError("trajectory index out of range")
+        return Point.Point(self.x[index], self.y[index], self.time[index], self.velocity[index],
+                           self.acceleration[index], self.comments.get(index, ""), self.drag[index],
+                           self.thrust[index], self.mach[index], self.mass[index])
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
@@ -0,0 +1,222 @@
+##
+#   benchmark.py
+#
+#   Speed and accuracy regression suite for ThrustProfile, Rocket and Solver. Besides the plain fixed step runs, the
+#   paths that claim to fly the same flight exactly (batch, coupled engine, cached curves, resume from burnout) have
+#   golden apogees of their own and must match the plain run bit for bit.
+#
+#   python benchmark.py                  Run the suite and compare apogees against benchmark_golden.json
+#   python benchmark.py --update         Rewrite the golden values from this run
+#   python benchmark.py --output FILE    Also write the json report to FILE
+##
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import Instrumentation
+import RocketTrajectoryCalculator
+import ThrustProfileCache
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+__psi_100_Pa = 689475.729
+__ft_2_m_2 = 0.092903
+__lb_kg = 0.453592
+__l_m3 = 0.001
+__in_m = 0.0254
+
+# Representative configurations. "main" is the design in main.py.
+configurations = {
+    "main": {
+        "airPressure": 11 * __psi_100_Pa, "airVolume": 2.3 * __l_m3, "waterVolume": 1 * __l_m3,
+        "payloadMass": 0.05 * __lb_kg, "structuralMass": (3.3 - 0.05) * __lb_kg, "tankRadius": 1.0 * __in_m,
+        "tankThickness": 0.13 * __in_m, "frontalArea": 3.14 * (1.13 * __in_m) ** 2, "d_noz": 0.5 * __in_m},
+    "solver-defaults": {},
+    "small-nozzle": {
+        "airPressure": 8 * __psi_100_Pa, "airVolume": 1.5 * __l_m3, "waterVolume": 0.5 * __l_m3,
+        "payloadMass": 0.2 * __lb_kg, "structuralMass": 2.0 * __lb_kg, "frontalArea": 0.015 * __ft_2_m_2,
+        "d_noz": 0.25 * __in_m},
+    "high-pressure": {
+        "airPressure": 20 * __psi_100_Pa, "airVolume": 3.0 * __l_m3, "waterVolume": 1.2 * __l_m3,
+        "payloadMass": 0.5 * __lb_kg, "structuralMass": 2.8 * __lb_kg, "frontalArea": 0.02 * __ft_2_m_2,
+        "d_noz": 0.6 * __in_m},
+}
+timeSteps = (0.01, 0.005, 0.001)
+# Paths that must reproduce the plain run exactly.
+variants = ("batch", "coupled", "cache", "resume")
+goldenPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_golden.json")
+
+
+def makeSolver(name, dt):
+    solver = RocketTrajectoryCalculator.Solver()
+    for attribute, value in configurations[name].items():
+        setattr(solver, attribute, value)
+    solver.dt = dt
+    solver.profileCache = None
+    return solver
+
+
+def fly(solver):
+    """ Flies the solver through Solver.simulate, so its drag, atmosphere, engine and integrator settings all apply,
+    timing the thrust profile and each phase of the flight.
+    :rtype : dict
+    """
+    solver.instrumentation = Instrumentation.Instrumentation()
+    solver.simulate(False, False)
+    report = solver.instrumentation.report()
+    solver.instrumentation = None
+    phases = {"profile": report["timers"].get("thrust profile", 0.0)}
+    counts = {}
+    for phase in ("burn", "blowdown", "coast"):
+        phases[phase] = report["timers"].get(phase, 0.0)
+        counts[phase] = report["steps"].get(phase, 0)
+    return {"apogee": solver.rocket.summary.apogee, "phases": phases, "steps": counts}
+
+
+def flyVariant(solver, variant):
+    """ Returns the apogee of the solver's flight taken along one of the variants, or None if it cannot run here. """
+    if variant == "batch":
+        try:
+            return float(solver.calculateBatch({}).apogee[0])
+        except ImportError:  # No numpy
+            return None
+    if variant == "coupled":
+        solver.engine = "coupled"
+        return solver.apogee().apogee
+    if variant == "cache":
+        # The curve is flown and stored on disk, then read back from disk by an empty cache.
+        directory = tempfile.mkdtemp()
+        try:
+            solver.profileCache = ThrustProfileCache.ThrustProfileCache(directory=directory)
+            solver.apogee()
+            solver.profileCache = ThrustProfileCache.ThrustProfileCache(directory=directory)
+            return solver.apogee().apogee
+        finally:
+            shutil.rmtree(directory)
+    if variant == "resume":
+        return solver.coast(solver.burnoutState()).apogee
+    raise ValueError("Unknown variant: {0}".format(variant))
+
+
+def measureMemory(solver):
+    """ Returns the memory each phase of a recorded flight took (see Instrumentation): the bytes added to the
+    trajectory and the change in resident set size, plus traced bytes and peak where tracemalloc is available, and the
+    process's peak resident set size after the run.
+    :rtype : dict {"phases": {phase: {...}}, "processPeakRssBytes": n or None}
+    """
+    solver.instrumentation = Instrumentation.Instrumentation(memory=True)
+    gc.collect()
+    if tracemalloc is not None:
+        tracemalloc.start()
+    try:
+        solver.simulate(False, True)
+    finally:
+        if tracemalloc is not None:
+            tracemalloc.stop()
+    memory = solver.instrumentation.report()["memory"]
+    solver.instrumentation = None
+    # ru_maxrss is in kilobytes on Linux.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource is not None else None
+    return {"phases": memory, "processPeakRssBytes": peak}
+
+
+def run(repeats=3):
+    """ Runs every configuration at every time step and returns the report. """
+    results = []
+    for name in sorted(configurations):
+        for dt in timeSteps:
+            best = None
+            for i in range(repeats):
+                result = fly(makeSolver(name, dt))
+                if best is None or sum(result["phases"].values()) < sum(best["phases"].values()):
+                    best = result
+            start = time.time()
+            makeSolver(name, dt).simulate(False, False)
+            total = time.time() - start
+            steps = sum(best["steps"].values())
+            flight = best["phases"]["burn"] + best["phases"]["blowdown"] + best["phases"]["coast"]
+            results.append({
+                "configuration": name,
+                "dt": dt,
+                "apogee": best["apogee"],
+                "wallTime": total,
+                "phaseTimes": best["phases"],
+                "phaseSteps": best["steps"],
+                "stepsPerSecond": steps / flight if flight > 0 else None,
+                "memory": measureMemory(makeSolver(name, dt)),
+            })
+            for variant in variants:
+                apogee = flyVariant(makeSolver(name, dt), variant)
+                if apogee is not None:
+                    results.append({"configuration": name, "dt": dt, "variant": variant, "apogee": apogee,
+                                    "matchesPlain": apogee == best["apogee"]})
+    return {"python": sys.version.split()[0], "results": results}
+
+
+def goldenKey(result):
+    key = "{0}@{1}".format(result["configuration"], result["dt"])
+    if "variant" in result:
+        key += "/" + result["variant"]
+    return key
+
+
+def compare(report, golden, tolerance):
+    """ Marks each result with its golden apogee and whether it is within the relative tolerance, and for variants
+    also equal to the plain run. Returns the number of failures. """
+    failures = 0
+    for result in report["results"]:
+        key = goldenKey(result)
+        expected = golden.get(key)
+        result["golden"] = expected
+        result["passed"] = (expected is not None and abs(result["apogee"] - expected) <= tolerance * abs(expected) and
+                            result.get("matchesPlain", True))
+        if not result["passed"]:
+            failures += 1
+    report["tolerance"] = tolerance
+    report["failures"] = failures
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and apogee regression suite.")
+    parser.add_argument("--update", action="store_true", help="rewrite the golden apogees from this run")
+    parser.add_argument("--output", help="write the json report to this file")
+    parser.add_argument("--tolerance", type=float, default=1e-6, help="allowed relative apogee difference")
+    parser.add_argument("--repeats", type=int, default=3, help="timing runs per case, the fastest is kept")
+    arguments = parser.parse_args()
+
+    report = run(arguments.repeats)
+    if arguments.update:
+        golden = dict((goldenKey(result), result["apogee"]) for result in report["results"])
+        goldenFile = open(goldenPath, "w")
+        json.dump(golden, goldenFile, indent=2, sort_keys=True, separators=(",", ": "))
+        goldenFile.write("\n")
+        goldenFile.close()
+    goldenFile = open(goldenPath)
+    failures = compare(report, json.load(goldenFile), arguments.tolerance)
+    goldenFile.close()
+
+    text = json.dumps(report, indent=2, sort_keys=True, separators=(",", ": "))
+    if arguments.output:
+        outputFile = open(arguments.output, "w")
+        outputFile.write(text + "\n")
+        outputFile.close()
+    sys.stdout.write(text + "\n")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())